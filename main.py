@@ -24,13 +24,20 @@ is as follows:
                               of components on said entities. It also provides
                               methods to setup, process, and cleanup an ECS.
             - components.py : Stores all the components in use by the game.
-                              Provides a "formal virtual interface" that should
-                              be implemented by all components.
+                              Provides a common base class that should be
+                              inherited by all components.
             - systems.py    : Stores all the systems in use by the game.
                               Provides a "formal virtual interface" that should
                               be implemented by all systems.
+            - spatial.py    : Stores a uniform-grid spatial hash, used to
+                              narrow down which colliders need to be tested
+                              against each other.
+            - storage.py    : Stores the column-wise archetype tables used by
+                              the ECS manager to hold component sets.
 """
 
+import csv
+import heapq
 import os
 import random
 import tkinter as tk
@@ -41,11 +48,22 @@ import src.ecs.components as components
 import src.ecs.systems as systems
 import src.platform as platform
 
+from concurrent.futures import ThreadPoolExecutor
 from math import pi
 
 from src.common import *
 
 
+## sprite outlines, as flat (x0, y0, x1, y1, ...) offsets from the centre of
+## the sprite. These are shared by every entity of the given kind
+PLAYER_VERTICES = (-5, 10, 0, -10, 5, 10, 0, 5)
+BULLET_VERTICES = (-5, 0, 0, 5, 5, 0, 0, -5)
+
+ENEMY_L_WING = (-3, 0, -5, 0, -7, 7, -10, 0)
+ENEMY_R_WING = (10, 0, 7, 7, 5, 0, 3, 0)
+ENEMY_VERTICES = (*ENEMY_L_WING, -7, -3, 7, -3, *ENEMY_R_WING, 0, 15)
+
+
 def run(root, starting_score=0, starting_lives=5):
     screen = platform.Screen(root)
 
@@ -68,24 +86,23 @@ def run(root, starting_score=0, starting_lives=5):
     manager.register_component(player, components.PlayerTag())
     screen.set_tracked_entity(player)
 
-    player_vertices = [-5, 10, 0, -10, 5, 10, 0, 5]
-    player_sprite = screen.draw_poly(player_vertices, fill=CYAN, tag='player')
+    player_sprite = screen.draw_poly(PLAYER_VERTICES, fill=CYAN, tag='player',
+            state='hidden')
     manager.register_component(player, components.Transform2D(WIDTH / 2,
         HEIGHT / 2, 0))
     manager.register_component(player, components.Collider2D(10, 20))
     manager.register_component(player, components.Velocity2D(0, 0))
     manager.register_component(player, components.UserInput(220))
     manager.register_component(player, components.ScreenElement(player_sprite,
-        player_vertices))
+        PLAYER_VERTICES))
 
     manager.register_component(player, components.Score(starting_score))
     manager.register_component(player, components.Lives(starting_lives))
     player_bullet_data = components.BulletData(
         bullet_size=10,
         bullet_speed=-270,
-        bullet_vertices=[-5, 0, 0, 5, 5, 0, 0, -5],
-        bullet_colours=[CYAN],
-        bullet_colour_idx=0)
+        bullet_vertices=BULLET_VERTICES,
+        bullet_colour=CYAN)
     manager.register_component(player, components.LinearBulletEmitter(
         data=player_bullet_data, direction=-1))
     manager.register_component(player, components.RadialBulletEmitter(
@@ -94,62 +111,80 @@ def run(root, starting_score=0, starting_lives=5):
     ## create enemy spawner
     enemy_spawner = manager.create_entity()
 
-    enemy_patterns = [
+    enemy_patterns = (
         'loner',
         'column',
         'row_ltr',
         'row_rtl',
-    ]
+    )
+
+    ## the game draws from its own generator, so that spawning does not
+    ## contend with (or get perturbed by) any other users of `random`
+    rng = random.Random()
+
+    def randint(low, high):
+        return low + int(rng.random() * (high - low + 1))
 
     enemy_size = 20
     enemy_padding = enemy_size / 2
 
+    ## yields (cooldown, spawn location, player score) for every enemy to be
+    ## spawned. The player score is read once, at the start of each spawn
+    ## pattern. Difficulty only changes at a few score thresholds, so both the
+    ## pattern and the enemies it creates work off this one value
     def next_spawn():
         while True:
-            next_pattern = random.choice(enemy_patterns)
+            next_pattern = enemy_patterns[int(rng.random() * len(enemy_patterns))]
             pattern_cooldown = 1
 
             min_enemies, max_enemies = 2, 3
 
-            player_score = screen.get_score()
-            if player_score > 100:
+            spawn_score = screen.get_score()
+            if spawn_score > 100:
                 min_enemies, max_enemies = 4, 5
-            if player_score > 150:
+            if spawn_score > 150:
                 min_enemies, max_enemies = 6, 7
-            if player_score > 200:
+            if spawn_score > 200:
                 pattern_cooldown = 0.75
 
-            base_px = random.randint(enemy_size, WIDTH - enemy_size)
-            enemy_count = random.randint(min_enemies, max_enemies)
+            base_px = randint(enemy_size, WIDTH - enemy_size)
+            enemy_count = randint(min_enemies, max_enemies)
 
             if next_pattern == 'loner':
-                yield (pattern_cooldown, (base_px, enemy_size))
+                yield (pattern_cooldown, (base_px, enemy_size), spawn_score)
 
             elif next_pattern == 'column':
                 for i in range(enemy_count):
-                    yield (0.25, (base_px, enemy_size))
-                yield (pattern_cooldown, (base_px, enemy_size))
+                    yield (0.25, (base_px, enemy_size), spawn_score)
+                yield (pattern_cooldown, (base_px, enemy_size), spawn_score)
 
             elif next_pattern == 'row_ltr':
                 max_px = enemy_count * (enemy_size + enemy_padding) + enemy_size
-                base_px = random.randint(enemy_size, WIDTH - max_px)
+                base_px = randint(enemy_size, WIDTH - max_px)
                 curr_px = base_px
                 for i in range(enemy_count):
-                    yield (0.05, (curr_px, enemy_size))
+                    yield (0.05, (curr_px, enemy_size), spawn_score)
                     curr_px += enemy_size + enemy_size / 2
-                yield (pattern_cooldown, (curr_px, enemy_size))
+                yield (pattern_cooldown, (curr_px, enemy_size), spawn_score)
 
             elif next_pattern == 'row_rtl':
                 min_px = enemy_count * (enemy_size + enemy_padding) + enemy_size
-                base_px = random.randint(min_px, WIDTH - enemy_size)
+                base_px = randint(min_px, WIDTH - enemy_size)
                 curr_px = base_px
                 for i in range(enemy_count):
-                    yield (0.05, (curr_px, enemy_size))
+                    yield (0.05, (curr_px, enemy_size), spawn_score)
                     curr_px -= enemy_size + enemy_size / 2
-                yield (pattern_cooldown, (curr_px, enemy_size))
+                yield (pattern_cooldown, (curr_px, enemy_size), spawn_score)
+
 
+    ## shared by every enemy that shoots
+    enemy_bullet_data = components.BulletData(
+        bullet_size=10,
+        bullet_speed=180,
+        bullet_vertices=BULLET_VERTICES,
+        bullet_colour=RED)
 
-    def create_enemy(spawn_location, manager, screen):
+    def create_enemy(spawn_location, manager, screen, spawn_score):
         e = manager.create_entity()
         manager.register_component(e, components.EnemyTag())
 
@@ -158,24 +193,19 @@ def run(root, starting_score=0, starting_lives=5):
         min_shooter_cooldown, max_shooter_cooldown = 2, 3
         heavy_chance = 0
 
-        player_score = screen.get_score()
-        if player_score > 100:
+        if spawn_score > 100:
             shooter_chance = 0.25
             min_shooter_cooldown = 1
             heavy_chance = 0.05
 
-        if player_score > 150:
+        if spawn_score > 150:
             shooter_chance = 0.5
             heavy_chance = 0.075
 
-        if player_score > 200:
+        if spawn_score > 200:
             max_shooter_cooldown = 2
             heavy_chance = 0.1
 
-        enemy_l_wing = [-3, 0, -5, 0, -7, 7, -10, 0]
-        enemy_r_wing = [10, 0, 7, 7, 5, 0, 3, 0]
-        enemy_vertices = [*enemy_l_wing, -7, -3, 7, -3, *enemy_r_wing, 0, 15]
-
         sx, sy = 16, 25
         px, py = spawn_location
         vx, vy = 0, enemy_speed
@@ -187,17 +217,10 @@ def run(root, starting_score=0, starting_lives=5):
             HEIGHT + 2 * sy))
 
         ## have some enemies shoot bullets we have to dodge
-        if random.random() <= shooter_chance:
-            enemy_bullet_data = components.BulletData(
-                bullet_size=10,
-                bullet_speed=180,
-                bullet_vertices=[-5, 0, 0, 5, 5, 0, 0, -5],
-                bullet_colours=[RED],
-                bullet_colour_idx=0)
-
+        if rng.random() <= shooter_chance:
             manager.register_component(e, components.EnemyEmitterCooldown(
                 min_shooter_cooldown, max_shooter_cooldown))
-            if random.randint(0, 1) == 1:
+            if randint(0, 1) == 1:
                 manager.register_component(e, components.LinearBulletEmitter(
                     data=enemy_bullet_data, direction=1))
             else:
@@ -206,15 +229,17 @@ def run(root, starting_score=0, starting_lives=5):
                     bullet_arc_offset=pi / 4))
 
         ## have some enemies have 2 lives
-        if random.random() <= heavy_chance:
-            sprite = screen.draw_poly(enemy_vertices, fill=MAGENTA)
+        if rng.random() <= heavy_chance:
+            sprite = screen.draw_poly(ENEMY_VERTICES, fill=MAGENTA,
+                    state='hidden')
             manager.register_component(e, components.ScreenElement(sprite,
-                enemy_vertices))
+                ENEMY_VERTICES))
             manager.register_component(e, components.Lives(2))
         else:
-            sprite = screen.draw_poly(enemy_vertices, fill=YELLOW)
+            sprite = screen.draw_poly(ENEMY_VERTICES, fill=YELLOW,
+                    state='hidden')
             manager.register_component(e, components.ScreenElement(sprite,
-                enemy_vertices))
+                ENEMY_VERTICES))
             manager.register_component(e, components.Lives(1))
 
 
@@ -226,7 +251,7 @@ def run(root, starting_score=0, starting_lives=5):
 
     ## start processing the game
     ecs.setup(manager, screen)
-    ecs.process(manager)
+    ecs.process(manager, screen)
     ecs.cleanup(manager, screen)
 
     player_score = screen.get_score()
@@ -237,24 +262,23 @@ def run(root, starting_score=0, starting_lives=5):
 
 
 def load_scores(fpath):
-    scores = {}
-
     if not os.path.isfile(fpath):
         return {}
 
-    with open(fpath, 'r') as f:
-        for line in f:
-            segments = line.rsplit(',')
-            name, score = segments[0], int(segments[1].strip())
-            scores[name] = score
-
-    return scores
+    with open(fpath, 'r', newline='') as f:
+        return {row[0]: int(row[1]) for row in csv.reader(f) if row}
 
 
 def save_scores(fpath, scores):
-    with open(fpath, 'w') as f:
-        for name, score in scores.items():
-            f.write(f'{name},{score}\n')
+    with open(fpath, 'w', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(scores.items())
+
+
+def report_save_error(future):
+    ## saves run on the I/O worker, so any error has to be reported from here
+    ## rather than raised back to the caller
+    if (err := future.exception()) is not None:
+        critical(f'Failed to save scores: {err}')
 
 
 def main():
@@ -264,6 +288,11 @@ def main():
 
     menu_elements = []
 
+    ## score file I/O happens on a single background worker, so that the menu
+    ## does not block on the disk. Being a single worker, reads and writes of
+    ## the score file are also performed in the order they were submitted
+    io_pool = ThreadPoolExecutor(max_workers=1)
+
     def disable_menu():
         for element in menu_elements:
             element.config(state='disabled')
@@ -280,18 +309,18 @@ def main():
         game_window = tk.Toplevel(root)
         game_window.title('Bullet Purgatory')
 
-        scores = load_scores(SCORE_FPATH)
+        ## the scores load in the background while the game is being played
+        pending_scores = io_pool.submit(load_scores, SCORE_FPATH)
         name, score = run(game_window, starting_score, starting_lives)
-        scores[name] = max(score, scores.get(name, 0))
 
-        entries, highscores = len(scores), {}
-        for _ in range(entries if entries < 10 else 10):
-            keyfunc = lambda t: t[1]
-            highest_scoring = max(scores.items(), key=keyfunc)[0]
+        scores = pending_scores.result()
+        scores[name] = max(score, scores.get(name, 0))
 
-            highscores[highest_scoring] = scores.pop(highest_scoring)
+        ## keep only the top 10 scores, ordered from highest to lowest
+        highscores = dict(heapq.nlargest(10, scores.items(), key=lambda t: t[1]))
 
-        save_scores(SCORE_FPATH, highscores)
+        io_pool.submit(save_scores, SCORE_FPATH, highscores).add_done_callback(
+                report_save_error)
 
         enable_menu()
 
@@ -303,7 +332,8 @@ def main():
     menu_elements.append(start_btn)
 
     def show_leaderboard():
-        highscores = load_scores(SCORE_FPATH)
+        ## waits for any still-pending save of the score file
+        highscores = io_pool.submit(load_scores, SCORE_FPATH).result()
         
         leaderboard_window = tk.Toplevel(root)
         leaderboard_window.title('Bullet Purgatory Leaderboard')
@@ -355,6 +385,8 @@ def main():
 
     root.mainloop()
 
+    io_pool.shutdown()
+
 
 if __name__ == '__main__':
     main() 
@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
 
-from os import listdir, mkdir
-from os.path import isdir, isfile, join
+from os import listdir, makedirs
+from os.path import getmtime, isfile, join
 from PIL import Image
-from shutil import rmtree
 
 from src.common import HEIGHT, WIDTH
 
@@ -13,13 +12,16 @@ OUT_DIR = join(BASE_DIR, 'out')
 
 
 def main():
-    if isdir(OUT_DIR):
-        rmtree(OUT_DIR)
-
-    mkdir(OUT_DIR)
+    makedirs(OUT_DIR, exist_ok=True)
 
     for fpath in (join(BASE_DIR, f) for f in listdir(BASE_DIR) if isfile(join(BASE_DIR, f))):
         fname = fpath.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+        out_fpath = join(OUT_DIR, f'{fname}.gif')
+
+        ## the resized image is only rebuilt when its source has changed
+        if isfile(out_fpath) and getmtime(out_fpath) > getmtime(fpath):
+            print(f'Fpath: {fpath} is up to date, skipping')
+            continue
 
         print(f'Fpath: {fpath}, Fname: {fname}')
         print(f'Target size: {WIDTH}x{HEIGHT}')
@@ -28,9 +30,10 @@ def main():
 
         resized = image.resize((WIDTH, HEIGHT))
 
-        resized.save(join(OUT_DIR, f'{fname}.gif'), format='GIF', save_all=True)
+        ## only animated sources need every frame written out
+        animated = getattr(image, 'n_frames', 1) > 1
+        resized.save(out_fpath, format='GIF', save_all=animated)
 
 
 if __name__ == '__main__':
     main()
-
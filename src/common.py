@@ -6,6 +6,31 @@ from enum import Enum
 
 WIDTH, HEIGHT = 500, 800
 
+## the length (pixels) of the playfield's diagonal, the furthest distance any
+## bullet needs to travel
+PLAYFIELD_DIAGONAL = ((HEIGHT ** 2) + (WIDTH ** 2)) ** 0.5
+
+## the side length (pixels) of a collision grid cell, roughly the size of the
+## largest collider in the game
+COLLISION_CELL_SIZE = 20
+
+## below this many colliders, testing every bullet against every target is
+## cheaper than building the collision grid
+COLLISION_GRID_THRESHOLD = 32
+
+## how far (pixels) outside of the playfield a finite-lived entity may travel
+## before being culled. Large enough to cover enemies leaving the bottom edge
+PLAYFIELD_MARGIN = 50
+
+## the number of steps per radian that sprite rotations are rounded to
+THETA_STEPS = 64
+
+## the maximum number of expired bullets kept around for reuse
+BULLET_POOL_SIZE = 512
+
+## the frame rate (frames per second) the game loop is scheduled to run at
+TARGET_FPS = 60
+
 HELP_CONTENTS = (
                 'Controls:\n'
                 'w: move player ship up\n'
@@ -79,14 +104,20 @@ MAGENTA = '#ff00ff'
 #SEVERITY = 0 ## turns off debug and warning messages
 SEVERITY = -1 ## turns off all messages
 
+## whether debug and warning messages are printed. Hot paths check these 
+## before calling debug() or warn(), to avoid formatting messages which would
+## only be thrown away
+DEBUG = SEVERITY >= 2
+WARN = SEVERITY >= 1
+
 
 def debug(msg):
-    if SEVERITY >= 2:
+    if DEBUG:
         print(f'DEBUG: {msg}')
 
 
 def warn(msg):
-    if SEVERITY >= 1:
+    if WARN:
         print(f'WARNING: {msg}')
 
 
@@ -98,19 +129,28 @@ def critical(msg):
 class AutoId:
     """
     Implements a stateful decorator to assign each decorated class a unique id.
+    Decorated component classes are also kept in a registry, indexed by cid.
     """
-    _component_id = 0
+    components = []
     _system_id = 0
 
 
     @classmethod
     def component(cls, wrapped_cls):
-        wrapped_cls.cid = cls._component_id
-        cls._component_id += 1
+        wrapped_cls.cid = len(cls.components)
+        cls.components.append(wrapped_cls)
 
         return wrapped_cls
 
 
+    @classmethod
+    def component_count(cls) -> int:
+        """
+        Returns the number of component classes assigned an id so far.
+        """
+        return len(cls.components)
+
+
     @classmethod
     def system(cls, wrapped_cls):
         wrapped_cls.sid = cls._system_id
@@ -1,39 +1,27 @@
-import abc
-
-from dataclasses import dataclass
-from typing import Any, Callable, Generator, List, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+from math import cos, pi, sin
+from typing import Any, Callable, Generator, Optional, Tuple
 
 from ..common import *
 
 
-class Component(metaclass=abc.ABCMeta):
-    """
-    Defines the interface for a 'Component', with a unique id.
-    """
-    @classmethod
-    def __subclasshook__(cls, subclass):
-        return (
-            hasattr(subclass, 'cid') and type(subclass.cid) is type(int)
-        )
-
-    @abc.abstractmethod
-    def cid(self) -> int:
-        """
-        Returns a unique id for this component class.
-        """
-        raise NotImplementedError
-
-
 class ComponentBase:
     """
     Implements functionality common to each component.
     """
-    def __hash__(self) -> int:
-        return self.cid
+    ## components are slotted to keep per-instance overhead down; the only
+    ## attribute shared by every component is the id of its owning entity
+    __slots__ = ('eid',)
+
+
+## components are duck-typed: anything decorated with AutoId.component (and so
+## carrying a `cid`) is a component. This name is kept for type annotations
+Component = ComponentBase
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Transform2D(ComponentBase):
     """
     Holds the position (pixels), rotation (radians).
@@ -43,8 +31,8 @@ class Transform2D(ComponentBase):
     theta: float
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Collider2D(ComponentBase):
     """
     Holds the size of the AABB in the x and y planes.
@@ -53,8 +41,8 @@ class Collider2D(ComponentBase):
     sy: float
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Collision(ComponentBase):
     """
     Stores a collision between 2 entities.
@@ -62,8 +50,8 @@ class Collision(ComponentBase):
     colliding_entity: int
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Velocity2D(ComponentBase):
     """
     Holds the velocity (pixels per second) of an entity.
@@ -72,18 +60,25 @@ class Velocity2D(ComponentBase):
     vy: float
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class ScreenElement(ComponentBase):
     """
-    Holds a handle to some screen element.
+    Holds a handle to some screen element, and the position and rotation it
+    was last drawn at (or None if it has not yet been drawn). Elements which
+    always move in lockstep may share a canvas tag as their group, and are
+    then moved together.
     """
     handle: int
-    vertices: List[int]
+    vertices: Tuple[int, ...]
+    last_px: Optional[float] = None
+    last_py: Optional[float] = None
+    last_theta: Optional[float] = None
+    group: Optional[str] = None
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class StaleTag(ComponentBase):
     """
     Marks an entity as being stale, and marks it to be be disposed of.
@@ -91,8 +86,8 @@ class StaleTag(ComponentBase):
     pass
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class EdgeHarm(ComponentBase):
     """
     Harms a given entity once it reaches the given y-coordinate.
@@ -101,8 +96,8 @@ class EdgeHarm(ComponentBase):
     py: int
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class UserInput(ComponentBase):
     """
     Receives input from peripherals.
@@ -110,8 +105,8 @@ class UserInput(ComponentBase):
     speed: int
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Score(ComponentBase):
     """
     Stores the current score that an entity has accrued.
@@ -119,8 +114,8 @@ class Score(ComponentBase):
     count: int
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Lives(ComponentBase):
     """
     Stores the number of lives that a given entitiy has.
@@ -128,8 +123,8 @@ class Lives(ComponentBase):
     count: int
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Lifespan(ComponentBase):
     """
     Gives an entity a finite lifespan, after which it gets destroyed.
@@ -137,8 +132,8 @@ class Lifespan(ComponentBase):
     ttl: float
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class PlayerTag(ComponentBase):
     """
     Marks an entity as a player.
@@ -146,8 +141,8 @@ class PlayerTag(ComponentBase):
     pass
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class EnemyTag(ComponentBase):
     """
     Marks an entity as an enemy.
@@ -155,20 +150,26 @@ class EnemyTag(ComponentBase):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class BulletData:
     """
-    Common bullet data.
+    Common bullet data. The lifespan of each bullet, long enough for it to
+    cross the whole playfield, is worked out once from its speed.
     """
     bullet_size: int
     bullet_speed: int
-    bullet_vertices: List[int]
-    bullet_colours: List[str]
-    bullet_colour_idx: int
+    bullet_vertices: Tuple[int, ...]
+    bullet_colour: str
+
+    bullet_lifespan: float = field(init=False, repr=False)
+
+
+    def __post_init__(self):
+        self.bullet_lifespan = PLAYFIELD_DIAGONAL / abs(self.bullet_speed)
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class BulletTag(ComponentBase):
     """
     Marks an entity as a bullet.
@@ -176,8 +177,18 @@ class BulletTag(ComponentBase):
     pass
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
+class Pooled(ComponentBase):
+    """
+    Marks an entity as belonging to an object pool, which it should be 
+    returned to instead of being disposed of once it becomes stale.
+    """
+    pool: Any
+
+
+@AutoId.component
+@dataclass(slots=True)
 class LinearBulletEmitter(ComponentBase):
     """
     Emits bullets in a straight line.
@@ -186,8 +197,8 @@ class LinearBulletEmitter(ComponentBase):
     direction: int
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class FireLinearBulletEmitter(ComponentBase):
     """
     Used to emit a bullet from a linear emitter.
@@ -195,20 +206,51 @@ class FireLinearBulletEmitter(ComponentBase):
     pass
 
 
-@dataclass
+@lru_cache(maxsize=None)
+def radial_directions(bullet_count: int, bullet_arc_offset: float) -> Tuple[Tuple[float, float], ...]:
+    """
+    Returns the (x, y) unit direction of each bullet in an arc of the given
+    number of bullets, rotated by the given offset (in radians). Cached, as
+    every enemy of a given pattern shares the same arc.
+    """
+    sweep_increment = 2 * pi / bullet_count
+
+    directions = []
+    for n in range(bullet_count):
+        theta = bullet_arc_offset + (n * sweep_increment)
+
+        ## Clockwise Rotation matrix:
+        ## [  cos0 sin0 ] [ x ] = [  x*cos0 + y*sin0 ]
+        ## [ -sin0 cos0 ] [ y ]   [ -x*sin0 + y*cos0 ]
+        ## Since we only have a 1-dimensional 'speed', we assign it to
+        ## 'y' (completely arbitrarily) and then calculate the [vx vy]
+        ## vector for the rotated projectile (we assume x = 0)
+        directions.append((sin(theta), cos(theta)))
+
+    return tuple(directions)
+
+
 @AutoId.component
+@dataclass(slots=True)
 class RadialBulletEmitter(ComponentBase):
     """
-    Emits bullets in an arc.
+    Emits bullets in an arc. The (x, y) unit direction of each bullet in the
+    arc is looked up once, when the emitter is created.
     """
     data: BulletData
     
     bullet_count: int
     bullet_arc_offset: float ## in radians
 
+    directions: Tuple[Tuple[float, float], ...] = field(init=False, repr=False)
+
+
+    def __post_init__(self):
+        self.directions = radial_directions(self.bullet_count, self.bullet_arc_offset)
+
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class FireRadialBulletEmitter(ComponentBase):
     """
     Used to emit a bullet from a radial emitter.
@@ -216,18 +258,21 @@ class FireRadialBulletEmitter(ComponentBase):
     pass
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class Spawner(ComponentBase):
     """
     Holds information for an entity spawner.
     """
-    spawn_generator: Generator[Tuple[float, Tuple[int, int]], None, None]
-    instantiate: Callable[[Tuple[int, int], Any, Any], int]
+    spawn_generator: Generator[Tuple[float, Tuple[int, int], int], None, None]
+    instantiate: Callable[[Tuple[int, int], Any, Any, int], int]
+
+    ## the time (seconds) until the next entity is spawned
+    cooldown_remaining: float = 0
 
 
-@dataclass
 @AutoId.component
+@dataclass(slots=True)
 class EnemyEmitterCooldown(ComponentBase):
     """
     Gives an enemy bullet emitter a cooldown.
@@ -235,3 +280,6 @@ class EnemyEmitterCooldown(ComponentBase):
     min_cooldown: float
     max_cooldown: float
 
+    ## the time (seconds) until the emitter next fires
+    cooldown_remaining: float = 0
+
@@ -1,16 +1,33 @@
 import time
 
 from dataclasses import dataclass
+from functools import lru_cache
 from pprint import pprint
 from typing import Any, Dict, Generator, Iterable, List, Optional, Set, Tuple
 
 from ..common import *
 from .components import *
+from .storage import *
 from .systems import *
 
 
+## archetypes are interned, as the same handful of archetypes are looked up 
+## repeatedly (e.g. by fetch_archetype and archetype_snapshot)
+@lru_cache(maxsize=None)
 def flatten_archetype(archetype):
-    return tuple(map(lambda c: c.cid, archetype))
+    return tuple(c.cid for c in archetype)
+
+
+@lru_cache(maxsize=None)
+def archetype_mask(archetype):
+    """
+    Returns the bitset of the component types in the given archetype, with 
+    one bit set per component cid. Used as the key of the archetype.
+    """
+    mask = 0
+    for component in archetype:
+        mask |= 1 << component.cid
+    return mask
 
 
 class EcsManager:
@@ -25,18 +42,58 @@ class EcsManager:
         ## holds all currently registered entities, indexed by entity id
         self.entities = set()
 
+        ## holds a liveness flag for every entity id ever created, indexed by
+        ## entity id. Cheaper to check than membership of the entities set
+        self._alive = bytearray()
+
+        ## holds the bitset of component types registered for each entity, 
+        ## indexed by entity id
+        self._entity_mask = {}
+
         ## holds hashmaps of system action archetypes, indexed by system action
         ## Is indexed by registered systems
         self.systems = {}
 
-        ## holds hashmaps of component sets, indexed by the id of the entity 
-        ## the components belong to. Is indexed by component archetype
+        ## holds (system action, action arguments) pairs, in the order that
+        ## the actions should be run each tick. The arguments are either the
+        ## archetype table, or its columns for columnar actions. Rebuilt 
+        ## whenever the set of registered systems changes
+        self._dispatch = []
+
+        ## holds the subset of the above pairs whose systems run while paused
+        self._paused_dispatch = []
+
+        ## holds the index of each of an action's component types within the
+        ## columns of its archetype table, in the order the action expects 
+        ## them. Is indexed by system action
+        self._action_columns = {}
+
+        ## holds lists of (system, system action) pairs operating on each
+        ## archetype, in system registration order. Is indexed by component 
+        ## archetype bitset
+        self._actions_for_archetype = {}
+
+        ## holds tables of component sets, stored column-wise with one column
+        ## per component type. Is indexed by component archetype bitset
         self.archetypes = {}
 
-        ## holds hashmaps of components, indexed by the id of the entity the
-        ## component belongs to. Is indexed by the cid of the component held in 
-        ## said hashmap
-        self.components = {}
+        ## holds the component types of each archetype, in the order that
+        ## they are stored in the archetype's table columns. Is indexed by
+        ## component archetype bitset
+        self._archetype_members = {}
+
+        ## holds the component stores backing each column of an archetype's
+        ## table, in column order. Is indexed by component archetype bitset
+        self._archetype_stores = {}
+
+        ## holds lists of the archetypes containing each component type. Is a
+        ## list indexed by the cid of the component type
+        self._archetypes_by_cid = [[] for _ in range(AutoId.component_count())]
+
+        ## holds sparse sets of components, indexed by the id of the entity the
+        ## component belongs to. Is a list indexed by the cid of the component
+        ## held in said sparse set
+        self.components = [SparseSet() for _ in range(AutoId.component_count())]
 
         ## the rate at which time flows
         self._deltatime = 1
@@ -53,12 +110,28 @@ class EcsManager:
             self.systems[system] = {}
 
             for action, action_archetype in system.actions().items():
-                archetype = flatten_archetype(action_archetype)
+                archetype = archetype_mask(action_archetype)
+                members = flatten_archetype(action_archetype)
                 self.systems[system][action] = archetype
 
                 if archetype not in self.archetypes:
-                    debug(f'New archetype encountered: {archetype}')
-                    self.archetypes[archetype] = {}
+                    debug(f'New archetype encountered: {members}')
+                    self.archetypes[archetype] = ArchetypeTable.for_archetype(members)
+                    self._archetype_members[archetype] = members
+                    self._archetype_stores[archetype] = tuple(
+                            self.components[cid] for cid in members)
+                    for cid in members:
+                        self._archetypes_by_cid[cid].append(archetype)
+                    self._actions_for_archetype[archetype] = []
+
+                self._actions_for_archetype[archetype].append((system, action))
+
+                ## the table may have been created for an action which lists
+                ## the same component types in a different order
+                table_members = self._archetype_members[archetype]
+                self._action_columns[action] = tuple(map(table_members.index, members))
+
+            self._rebuild_dispatch()
 
 
     def deregister_system(self, system: System):
@@ -71,14 +144,56 @@ class EcsManager:
             return
 
         for action, action_archetype in actionset.items():
-            for _, other_actionset in self.systems.items():
-                if action_archetype in other_actionset.values():
-                    break
-            else:
-                ## if no other systems have the same archetype, we can remove
+            self._action_columns.pop(action, None)
+
+            archetype_actions = self._actions_for_archetype[action_archetype]
+            archetype_actions.remove((system, action))
+
+            if not archetype_actions:
+                ## if no other actions have the same archetype, we can remove
                 ## the archetype from the map
+                self._actions_for_archetype.pop(action_archetype)
                 self.archetypes.pop(action_archetype, None)
-                debug(f'Deregistered stale archetype: {action_archetype}')
+                members = self._archetype_members.pop(action_archetype, ())
+                self._archetype_stores.pop(action_archetype, None)
+                for cid in members:
+                    self._archetypes_by_cid[cid].remove(action_archetype)
+                debug(f'Deregistered stale archetype: {members}')
+
+        self._rebuild_dispatch()
+
+
+    def _rebuild_dispatch(self):
+        """
+        Binds every registered system action to the table of its archetype.
+        Actions are ordered by archetype, then by system registration order.
+        """
+        self._dispatch = []
+        self._paused_dispatch = []
+
+        for archetype, table in self.archetypes.items():
+            for system, action in self._actions_for_archetype[archetype]:
+                entry = (action, self._action_args(action, table))
+                self._dispatch.append(entry)
+
+                if system.runs_while_paused:
+                    self._paused_dispatch.append(entry)
+
+
+    def _action_args(self, action, table: ArchetypeTable) -> Tuple[Any, ...]:
+        """
+        Returns the arguments passed to the given action after dt and the
+        manager, with the table's columns reordered to match the action.
+        """
+        column_indices = self._action_columns[action]
+
+        if is_columnar(action):
+            return tuple(table.columns[idx] for idx in column_indices)
+
+        if column_indices == tuple(range(len(column_indices))):
+            return (table,)
+
+        return (ArchetypeView(table, column_indices),)
 
 
     def create_entity(self) -> int:
@@ -92,6 +207,8 @@ class EcsManager:
 
         ## we start tracking the entity
         self.entities.add(entity)
+        self._alive.append(1)
+        self._entity_mask[entity] = 0
 
         return entity
 
@@ -104,57 +221,57 @@ class EcsManager:
         component will be returned. Otherwise, the newly set component will be 
         returned.
         """
-        if entity not in self.entities:
+        if entity >= len(self._alive) or not self._alive[entity]:
             critical(f'UNKNOWN ENTITY: {entity}')
             raise ValueError('Attempted to register component for unknown entity')
 
         component_type = component.cid
-        debug(f'Registering component type {component_type} for entity {entity}')
+        if DEBUG:
+            debug(f'Registering component type {component_type} for entity {entity}')
 
         ## link the component and entity, so that we can later retrieve the
         ## currently operated upon entity from a given component
         component.eid = entity
 
-        ## if no component of the given type has yet been registered
-        if component_type not in self.components:
-            debug(f'New component type: {component_type}')
-            self.components[component_type] = {}  ## create a hashmap for it
+        old_component = self.components[component_type].insert(entity, component)
 
-        old_component = self.components[component_type].pop(entity, None)
-
-        ## no component of given type registered for the given entity
+        ## no component of given type registered for the given entity, so the
+        ## new component was registered
         if old_component is None:
-            ## register the new component
-            self.components[component_type][entity] = component
-
-            ## we need to add the entity to any archetypes that need it
-            for archetype, bucket in self.archetypes.items():
-                if entity in bucket:
-                    ## dont add entity to bucket twice to keep debug log clear
+            component_bit = 1 << component_type
+            entity_mask = self._entity_mask[entity] | component_bit
+            self._entity_mask[entity] = entity_mask
+
+            ## we need to add the entity to any archetypes that need it. Only
+            ## archetypes containing the new component can have been affected,
+            ## and the entity cannot already have been in any of them
+            for archetype in self._archetypes_by_cid[component_type]:
+                if entity_mask & archetype != archetype:
+                    ## entity doesnt have the necessary components registered
                     continue
 
-                values = [None] * len(archetype)
-                for idx, component_type in enumerate(archetype):
-                    if (component_type not in self.components or
-                        entity not in self.components[component_type]):
-                        ## component type not registered, or entity doesnt
-                        ## have the necessary component registered component
-                        break
-                    values[idx] = self.components[component_type][entity]
-                else:
-                    ## by adding the components to the archetype bucket, we can
-                    ## iterate through only the components we need when dealing 
-                    ## with the archetype later
-                    bucket[entity] = tuple(values)
-                    debug(f'Adding entity {entity} to archetype bucket: {archetype}')
+                ## by adding the components to the archetype table, we can
+                ## iterate through only the components we need when dealing 
+                ## with the archetype later
+                self.archetypes[archetype].gather(entity, self._archetype_stores[archetype])
+                if DEBUG:
+                    debug(f'Adding entity {entity} to archetype table: {self._archetype_members[archetype]}')
 
             ## return the registered component
             return component
 
-        warn(f'Entity {entity} has existing component of type {component_type}!')
+        if WARN:
+            warn(f'Entity {entity} has existing component of type {component_type}!')
+
+        ## component already existed, so it was replaced. The entity's
+        ## archetype membership is unchanged, so we only need to swap the new
+        ## component into the rows of the archetypes it is a member of
+        entity_mask = self._entity_mask[entity]
+        for archetype in self._archetypes_by_cid[component_type]:
+            if entity_mask & archetype == archetype:
+                self.archetypes[archetype].replace(entity, component_type, component)
 
-        ## component already exists, so replace it and return old value
-        self.components[component_type][entity] = component
+        ## return the old value
         return old_component
 
 
@@ -163,17 +280,32 @@ class EcsManager:
         Returns the component of the given type, which was registered for the 
         given entity, if one exists. Otherwise, this method returns None.
         """
-        if entity not in self.entities:
+        if entity >= len(self._alive) or not self._alive[entity]:
             critical(f'UNKNOWN ENTITY: {entity}')
             raise ValueError('Attempted to fetch component for unknown entity')
 
-        if component_type not in self.components:
-            return None
+        return self.components[component_type].get(entity)
 
-        if entity not in self.components[component_type]:
-            return None
 
-        return self.components[component_type][entity]
+    def has_component(self, entity: int, component_type: int) -> bool:
+        """
+        Returns True if a component of the given type is registered for the 
+        given entity. Cheaper than fetching the component, as only the bitset 
+        of the entity's component types needs to be checked.
+        """
+        if (entity_mask := self._entity_mask.get(entity)) is None:
+            critical(f'UNKNOWN ENTITY: {entity}')
+            raise ValueError('Attempted to check component for unknown entity')
+
+        return entity_mask >> component_type & 1 == 1
+
+
+    def count_components(self, component_type: int) -> int:
+        """
+        Returns the number of entities which have a component of the given 
+        type registered.
+        """
+        return len(self.components[component_type])
 
 
     def deregister_component(self, entity: int, component_type: int) -> Optional[Component]:
@@ -183,22 +315,28 @@ class EcsManager:
         and the component will be returned. If no such component is registered, 
         this method will return None.
         """
-        if entity not in self.entities:
+        if entity >= len(self._alive) or not self._alive[entity]:
             critical(f'UNKNOWN ENTITY: {entity}')
             raise ValueError('Attempted to deregister component for unknown entity')
 
-        if self.fetch_component(entity, component_type) is not None:
+        if (component := self.components[component_type].remove(entity)) is None:
+            return None
+
+        if DEBUG:
             debug(f'Deregistering component type {component_type} for entity {entity}')
-            ## we need to deregister any stale component sets for this entity
-            ## from any archetypes where they were registered
-            for archetype, bucket in self.archetypes.items():
-                if component_type in archetype and entity in bucket:
-                    value = bucket.pop(entity)
+        ## we need to deregister any stale component sets for this entity
+        ## from any archetypes where they were registered
+        component_bit = 1 << component_type
+        entity_mask = self._entity_mask[entity]
+        self._entity_mask[entity] = entity_mask & ~component_bit
 
-            ## we return the old component that we just removed
-            return self.components[component_type].pop(entity)
+        for archetype in self._archetypes_by_cid[component_type]:
+            ## only archetypes the entity was actually a member of
+            if entity_mask & archetype == archetype:
+                self.archetypes[archetype].remove(entity)
 
-        return None
+        ## we return the old component that we just removed
+        return component
 
 
     def destroy_entity(self, entity: int) -> List[Component]:
@@ -208,23 +346,33 @@ class EcsManager:
         This method returns a list of all components that were registered for 
         the given entity.
         """
-        if entity not in self.entities:
+        if entity >= len(self._alive) or not self._alive[entity]:
             critical(f'UNKNOWN ENTITY: {entity}')
             raise ValueError('Attempted to destroy unknown entity')
 
+        entity_mask = self._entity_mask.pop(entity)
+
+        ## we unregister all of our registered components, visiting only the
+        ## component types set in the entity's bitset (lowest cid first)
         registered_components = []
-        for component_type, components in self.components.items():
-            ## if the entity had a component of the given type registered
-            ## we add it to the list of components to return
-            if entity in components:
-                registered_components.append(components[entity])
+        remaining = entity_mask
+        while remaining:
+            component_bit = remaining & -remaining
+            remaining ^= component_bit
+            component_type = component_bit.bit_length() - 1
+
+            registered_components.append(self.components[component_type].remove(entity))
 
-        ## we unregister all of our registered components
-        for component in registered_components:
-            self.deregister_component(entity, component.cid)
+            for archetype in self._archetypes_by_cid[component_type]:
+                ## each archetype is only visited via its lowest component
+                ## type, so that the entity is removed from each table once
+                if archetype & -archetype == component_bit and \
+                   entity_mask & archetype == archetype:
+                    self.archetypes[archetype].remove(entity)
 
         ## actually stop tracking the entity
         self.entities.remove(entity)
+        self._alive[entity] = 0
 
         return registered_components
 
@@ -233,11 +381,24 @@ class EcsManager:
         """
         Fetch all component sets for the given archetype and return them.
         """
-        if archetype not in self.archetypes:
+        if (table := self.archetypes.get(archetype_mask(archetype))) is None:
             warn(f'Tried to fetch unknown archetype {archetype}!')
             return None
 
-        return self.archetypes[archetype].values()
+        return table.rows()
+
+
+    def archetype_snapshot(self, archetype: Tuple[type, ...]) -> List[Tuple[Component, ...]]:
+        """
+        Returns a list of all component sets for the given archetype. Unlike 
+        the live table passed to system actions, the list is unaffected by 
+        entities joining or leaving the archetype while it is iterated over.
+        """
+        if (table := self.archetypes.get(archetype_mask(archetype))) is None:
+            warn(f'Tried to snapshot unknown archetype {archetype}!')
+            return []
+
+        return list(table.rows())
 
 
     def get_deltatime(self):
@@ -278,29 +439,41 @@ def cleanup(manager: EcsManager, screen: Screen):
         manager.destroy_entity(entity)
 
 
-def process(manager: EcsManager):
+def process(manager: EcsManager, screen: Screen):
     """
-    Processes systems until an EcsContinuation.Stop is returned.
+    Processes systems until an EcsContinuation.Stop is returned. Each tick is
+    run as one frame of the screen's event loop.
     """
     if len(manager.systems) == 0:
         warn(f'No systems have been registered!')
         return
 
-    last_tick_time = time.time()
-    while True:
-        current_tick_time = time.time()
-        dt = (current_tick_time - last_tick_time) * manager.get_deltatime()
+    ## looked up once, rather than on every tick or action. The dispatch
+    ## lists are still read every tick, as they are replaced whenever the
+    ## registered systems change
+    perf_counter_ns = time.perf_counter_ns
+    get_deltatime = manager.get_deltatime
+    stop = EcsContinuation.Stop
+
+    last_tick_time = perf_counter_ns()
+    def tick() -> bool:
+        nonlocal last_tick_time
+
+        current_tick_time = perf_counter_ns()
+        deltatime = get_deltatime()
+        dt = (current_tick_time - last_tick_time) * 1e-9 * deltatime
 
-        for archetype, component_sets in manager.archetypes.items():
-            for system, actionset in manager.systems.items():
-                for action, action_archetype in actionset.items():
-                    if archetype != action_archetype:
-                        continue
+        ## while paused, only the systems which need to (e.g. to redraw the
+        ## screen or to handle unpausing) are run
+        dispatch = manager._dispatch if deltatime else manager._paused_dispatch
 
-                    components = list(component_sets.values())
-                    if action(dt, manager, components) == EcsContinuation.Stop:
-                        debug(f'System action {action} stopped ECS')
-                        return
+        for action, args in dispatch:
+            ## enum members are singletons, so identity is enough here
+            if action(dt, manager, *args) is stop:
+                debug(f'System action {action} stopped ECS')
+                return False
 
         last_tick_time = current_tick_time
+        return True
 
+    screen.run_loop(tick)
@@ -0,0 +1,61 @@
+from typing import Set
+
+from ..common import *
+
+
+__all__ = ['SpatialHash']
+
+
+class SpatialHash:
+    """
+    Buckets axis-aligned bounding boxes into a uniform grid of square cells.
+    Only boxes that share a cell can possibly overlap, so only those need to
+    be tested against each other.
+    """
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+
+        ## holds lists of inserted items, indexed by the (x, y) grid cell
+        ## which the item overlaps
+        self.cells = {}
+
+
+    def clear(self):
+        """
+        Removes all items from the grid.
+        """
+        self.cells.clear()
+
+
+    def insert(self, item: int, x0: float, y0: float, x1: float, y1: float):
+        """
+        Inserts the given item into every cell covered by the box spanning
+        (x0, y0) to (x1, y1).
+        """
+        cell_size = self.cell_size
+        cells = self.cells
+
+        for cx in range(int(x0 // cell_size), int(x1 // cell_size) + 1):
+            for cy in range(int(y0 // cell_size), int(y1 // cell_size) + 1):
+                if (bucket := cells.get((cx, cy))) is None:
+                    cells[(cx, cy)] = [item]
+                else:
+                    bucket.append(item)
+
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> Set[int]:
+        """
+        Returns every item sharing at least one cell with the box spanning 
+        (x0, y0) to (x1, y1). Each item is returned only once, even if it
+        shares multiple cells with the box.
+        """
+        cell_size = self.cell_size
+        cells = self.cells
+
+        found = set()
+        for cx in range(int(x0 // cell_size), int(x1 // cell_size) + 1):
+            for cy in range(int(y0 // cell_size), int(y1 // cell_size) + 1):
+                if (bucket := cells.get((cx, cy))) is not None:
+                    found.update(bucket)
+
+        return found
@@ -0,0 +1,236 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+__all__ = ['ArchetypeTable', 'ArchetypeView', 'SparseSet']
+
+
+@dataclass(slots=True)
+class ArchetypeTable:
+    """
+    Stores the component sets of every entity matching an archetype as a set
+    of parallel columns, one per component type in the archetype. The
+    components of the entity at entities[i] are held at index i of each
+    column. Rows are removed by swapping in the last row, so the columns
+    always stay densely packed. Systems may read whole columns at a time, to
+    work on one component type across every entity in the archetype.
+    """
+    archetype: Tuple[int, ...] = ()
+    entities: List[int] = field(default_factory=list)
+    entity_index: Dict[int, int] = field(default_factory=dict)
+    columns: List[List[Any]] = field(default_factory=list)
+
+
+    @classmethod
+    def for_archetype(cls, archetype: Tuple[int, ...]) -> 'ArchetypeTable':
+        """
+        Creates an empty table with one column per component type in the
+        given archetype.
+        """
+        return cls(archetype=archetype, columns=[[] for _ in archetype])
+
+
+    def __contains__(self, entity: int) -> bool:
+        return entity in self.entity_index
+
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        return self.rows()
+
+
+    def column(self, component_type: int) -> List[Any]:
+        """
+        Returns the column holding the components of the given type. The
+        component at index i belongs to the entity at entities[i].
+        """
+        return self.columns[self.archetype.index(component_type)]
+
+
+    def gather(self, entity: int, stores: Tuple['SparseSet', ...]):
+        """
+        Appends a row for the given entity, taking the component for each
+        column from the matching store. Avoids building an intermediate row.
+        """
+        self.entity_index[entity] = len(self.entities)
+        self.entities.append(entity)
+
+        for column, store in zip(self.columns, stores):
+            column.append(store.get(entity))
+
+
+    def replace(self, entity: int, component_type: int, value: Any):
+        """
+        Overwrites the component of the given type in the given entity's row.
+        """
+        self.column(component_type)[self.entity_index[entity]] = value
+
+
+    def remove(self, entity: int) -> bool:
+        """
+        Removes the row belonging to the given entity, if it has one. The last
+        row is moved into the freed slot. Returns True if a row was removed.
+        """
+        if (idx := self.entity_index.pop(entity, None)) is None:
+            return False
+
+        last_entity = self.entities.pop()
+        if last_entity != entity:
+            ## move the last row into the hole left by the removed row
+            self.entities[idx] = last_entity
+            self.entity_index[last_entity] = idx
+
+            for column in self.columns:
+                column[idx] = column.pop()
+        else:
+            for column in self.columns:
+                column.pop()
+
+        return True
+
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """
+        Yields the component set of every entity in the table, in column order.
+        """
+        return zip(*self.columns)
+
+
+@dataclass(slots=True)
+class ArchetypeView:
+    """
+    Presents the rows of an archetype table with its columns reordered, for
+    system actions which list the archetype's component types in a different
+    order to the one the table was created with.
+    """
+    table: ArchetypeTable
+    column_indices: Tuple[int, ...]
+
+
+    @property
+    def entities(self) -> List[int]:
+        return self.table.entities
+
+
+    def __contains__(self, entity: int) -> bool:
+        return entity in self.table
+
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        columns = self.table.columns
+        return zip(*[columns[idx] for idx in self.column_indices])
+
+
+    def column(self, component_type: int) -> List[Any]:
+        return self.table.column(component_type)
+
+
+class SparseSet:
+    """
+    Maps entity ids to values. Values are kept densely packed, alongside the
+    ids of the entities they belong to, while a sparse list maps each entity
+    id to the index of its value. Lookups are therefore a pair of list
+    indexing operations rather than a hash lookup.
+    """
+    __slots__ = ('sparse', 'dense_eids', 'dense_vals')
+
+
+    def __init__(self):
+        ## holds the dense index of each entity's value, indexed by entity id.
+        ## Stale indices are left in place, and are detected by checking
+        ## the dense entity id list
+        self.sparse = []
+
+        ## holds the id of the entity each dense value belongs to
+        self.dense_eids = []
+
+        ## holds the values themselves, in the same order as dense_eids
+        self.dense_vals = []
+
+
+    def __contains__(self, entity: int) -> bool:
+        return self.index(entity) is not None
+
+
+    def __len__(self) -> int:
+        return len(self.dense_eids)
+
+
+    def index(self, entity: int) -> Optional[int]:
+        """
+        Returns the dense index of the given entity's value, or None if the
+        entity has no value in the set.
+        """
+        ## entities never stored, or whose stale index lies past the end of
+        ## the dense list, fail the lookup with an IndexError
+        try:
+            idx = self.sparse[entity]
+            if self.dense_eids[idx] == entity:
+                return idx
+        except IndexError:
+            pass
+
+        return None
+
+
+    def get(self, entity: int, default: Any = None) -> Any:
+        """
+        Returns the value of the given entity, or the default if the entity 
+        has no value in the set.
+        """
+        try:
+            idx = self.sparse[entity]
+            if self.dense_eids[idx] == entity:
+                return self.dense_vals[idx]
+        except IndexError:
+            pass
+
+        return default
+
+
+    def insert(self, entity: int, value: Any) -> Any:
+        """
+        Sets the value of the given entity. Returns the value that was replaced,
+        or None if the entity had no value in the set.
+        """
+        if (idx := self.index(entity)) is not None:
+            old_value = self.dense_vals[idx]
+            self.dense_vals[idx] = value
+            return old_value
+
+        if entity >= len(self.sparse):
+            self.sparse.extend([0] * (entity + 1 - len(self.sparse)))
+
+        self.sparse[entity] = len(self.dense_eids)
+        self.dense_eids.append(entity)
+        self.dense_vals.append(value)
+        return None
+
+
+    def remove(self, entity: int) -> Any:
+        """
+        Removes and returns the value of the given entity, or returns None if 
+        the entity has no value in the set. The last value is moved into the
+        freed slot.
+        """
+        if (idx := self.index(entity)) is None:
+            return None
+
+        value = self.dense_vals[idx]
+
+        last_entity = self.dense_eids.pop()
+        last_value = self.dense_vals.pop()
+        if last_entity != entity:
+            ## move the last value into the hole left by the removed value
+            self.dense_eids[idx] = last_entity
+            self.dense_vals[idx] = last_value
+            self.sparse[last_entity] = idx
+
+        return value
@@ -1,18 +1,41 @@
 import abc
 import random
-import time
 
-from math import cos, pi, sin
+from functools import lru_cache
+from math import cos, sin
 #from profilehooks import profile
-from typing import Any, Callable, Dict, Iterator, Tuple, TypeVar
+from typing import Any, Callable, Dict, Iterable, Tuple
 
 from ..common import *
 from .components import *
+from .spatial import *
 from ..platform import *
 
 
-## takes dt (seconds), manager (EcsManager instance), components
-SystemAction = Callable[[float, Any, Iterator[Tuple[Component, ...]]], EcsContinuation]
+## takes dt (seconds), manager (EcsManager instance), components. The 
+## components are a live view over the archetype table, and so must not be
+## iterated over while entities join or leave the archetype. Actions which do
+## so should iterate over manager.archetype_snapshot() instead. Actions marked
+## with @columnar are instead passed one list per archetype column
+SystemAction = Callable[[float, Any, Iterable[Tuple[Component, ...]]], EcsContinuation]
+
+
+def columnar(action: Callable) -> Callable:
+    """
+    Marks a system action as columnar. Instead of the rows of its archetype,
+    a columnar action is passed every column of the archetype table as a 
+    separate list, in archetype order. The components at index i of each 
+    column all belong to the same entity.
+    """
+    action.columnar = True
+    return action
+
+
+def is_columnar(action: Callable) -> bool:
+    """
+    Returns whether the given system action was marked as columnar.
+    """
+    return getattr(action, 'columnar', False)
 
 
 class System(metaclass=abc.ABCMeta):
@@ -57,15 +80,40 @@ class SystemBase:
     """
     Implements functionality common to each system.
     """
+    ## whether the system's actions are still run while the ECS is paused
+    runs_while_paused = False
+
     def __hash__(self) -> int:
         return self.sid
 
 
+@lru_cache(maxsize=4096)
+def rotate_vertices(vertices: Tuple[int, ...], theta_step: int) -> Tuple[float, ...]:
+    """
+    Returns the given (x0, y0, x1, y1, ...) vertices rotated clockwise (in 
+    screen space) about the origin by the given number of THETA_STEPS. Cached,
+    as most sprites only ever use a handful of distinct rotations.
+    """
+    theta = theta_step / THETA_STEPS
+    c, s = cos(theta), sin(theta)
+
+    rotated = []
+    for i in range(0, len(vertices), 2):
+        x, y = vertices[i], vertices[i + 1]
+        rotated.append(x * c - y * s)
+        rotated.append(x * s + y * c)
+
+    return tuple(rotated)
+
+
 @AutoId.system
 class Render2DSystem(SystemBase):
     """
     System to handle rendering code.
     """
+    ## the screen is still redrawn, and window events pumped, while paused
+    runs_while_paused = True
+
     def actions(self):
         return {
             self.process_active: (Transform2D, ScreenElement),
@@ -78,17 +126,68 @@ class Render2DSystem(SystemBase):
         
 
     def process_active(self, dt, manager, components) -> EcsContinuation:
+        ## elements which need all of their vertices placed, as (handle, coords)
+        placements = []
+
+        ## elements are drawn hidden, and only shown once they are first placed,
+        ## so that they never appear at their unplaced coords
+        placed_first = []
+
+        ## how far each group of elements moved this frame, and the handles 
+        ## of the group's members that moved, indexed by the canvas tag shared
+        ## by the group
+        group_moves = {}
+
         for transform, element in components:
-            coords = [None] * len(element.vertices)
+            px, py, theta = transform.px, transform.py, transform.theta
+
+            if element.last_px is None or theta != element.last_theta:
+                vertices = element.vertices
+                if theta != 0:
+                    vertices = rotate_vertices(
+                            tuple(vertices), round(theta * THETA_STEPS))
+
+                ## translate coords into screen space. Even-indexed elements
+                ## are x coords, and odd-indexed elements are y coords
+                coords = list(vertices)
+                coords[0::2] = [x + px for x in vertices[0::2]]
+                coords[1::2] = [y + py for y in vertices[1::2]]
+
+                placements.append((element.handle, coords))
+                if element.last_px is None:
+                    placed_first.append(element.handle)
+
+            elif px != element.last_px or py != element.last_py:
+                dx, dy = px - element.last_px, py - element.last_py
+
+                ## the element has already been placed, so we only need to
+                ## shift it by however far it moved since the last frame. All
+                ## elements in a group move together, so one move covers them
+                if element.group is None:
+                    self.screen.move(element.handle, dx, dy)
+                elif (group_move := group_moves.get(element.group)) is None:
+                    group_moves[element.group] = (dx, dy, [element.handle])
+                else:
+                    group_move[2].append(element.handle)
+
+            else:  ## the element has not moved, so there is nothing to redraw
+                continue
+
+            element.last_px, element.last_py, element.last_theta = px, py, theta
 
-            ## translate coords into screen space
-            for i in range(len(element.vertices)):
-                if i % 2 == 0:  ## even-indexed elements are x coords
-                    coords[i] = element.vertices[i] + transform.px
-                else:  ## odd-indexed elements are y coords
-                    coords[i] = element.vertices[i] + transform.py
+        ## moving by tag makes tk search every item on the canvas, whereas 
+        ## moving by handle is a single lookup, so groups with only a single 
+        ## member are moved by handle
+        for group, (dx, dy, handles) in group_moves.items():
+            if len(handles) == 1:
+                self.screen.move(handles[0], dx, dy)
+            else:
+                self.screen.move(group, dx, dy)
 
-            self.screen.set_coords(element.handle, coords)
+        ## placements happen after the group moves, so that newly placed
+        ## members of a group are not also shifted by the group move
+        if placements:
+            self.screen.set_coords_batch(placements, placed_first)
 
         self.screen.tick(dt, manager)
 
@@ -96,8 +195,14 @@ class Render2DSystem(SystemBase):
 
     
     def process_stale(self, dt, manager, components) -> EcsContinuation:
-        for tag, in components:
+        ## destroying entities removes them from the table, so iterate over
+        ## a copy of it instead
+        for tag, in manager.archetype_snapshot((StaleTag,)):
             entity = tag.eid
+            if (pooled := manager.fetch_component(entity, Pooled.cid)) is not None:
+                pooled.pool.release(manager, entity)
+                continue
+
             if (element := manager.fetch_component(entity, ScreenElement.cid)) is not None:
                 self.screen.remove(element.handle)
             manager.destroy_entity(entity)
@@ -109,6 +214,22 @@ class Render2DSystem(SystemBase):
         pass
 
 
+def collide(px, py, sx, sy, candidates):
+    """
+    Returns the (a, b) index pairs from the given candidates whose boxes, 
+    centred on (px, py) with extents (sx, sy), overlap.
+    """
+    ## two boxes overlap on an axis when the distance between their 
+    ## centres is less than the sum of their half extents. This is the
+    ## same as comparing all four edges, but needs only one comparison 
+    ## per axis, and multiplies by 2 rather than halving every extent
+    return [
+        (a, b) for a, b in candidates
+        if abs(px[a] - px[b]) * 2 < sx[a] + sx[b] and
+           abs(py[a] - py[b]) * 2 < sy[a] + sy[b]
+    ]
+
+
 @AutoId.system
 class Collider2DSystem(SystemBase):
     """
@@ -121,55 +242,74 @@ class Collider2DSystem(SystemBase):
 
 
     def setup(self, manager, screen):
-        pass
+        self.spatial_hash = SpatialHash(COLLISION_CELL_SIZE)
 
 
-    def do_intersect(self, transform_a, collider_a, transform_b, collider_b):
-        if transform_a.px - collider_a.sx / 2 < transform_b.px + collider_b.sx / 2 and \
-           transform_a.px + collider_a.sx / 2 > transform_b.px - collider_b.sx / 2 and \
-           transform_a.py - collider_a.sy / 2 < transform_b.py + collider_b.sy / 2 and \
-           transform_a.py + collider_a.sy / 2 > transform_b.py - collider_b.sy / 2:
-            return True
-
-        return False
-
-    ## TODO: implement spatial hashing
     #@profile
     def process(self, dt, manager, components) -> EcsContinuation:
-        for idx, (transform_a, collider_a) in enumerate(components):
-            entity_a = transform_a.eid
-
-            for transform_b, collider_b in components[idx:]:
-                entity_b = transform_b.eid
-
-                if entity_a == entity_b:
-                    continue
-
-                ## only register collisions between a bullet and non-bullet
-                bullet_a = manager.fetch_component(entity_a, BulletTag.cid)
-                bullet_b = manager.fetch_component(entity_b, BulletTag.cid)
-                if (bullet_a is not None and bullet_b is not None) or \
-                   (bullet_a is None and bullet_b is None):
-                    continue
-
-                bullet = entity_a if bullet_a is not None else entity_b
-                other = entity_b if bullet_a is not None else entity_a
-
-                if self.do_intersect(transform_a, collider_a, transform_b, collider_b):
-                    ## TODO: consider splitting collision resolution into separate system?
-                    #manager.register_component(entity_a, Collision(entity_b))
-                    #manager.register_component(entity_b, Collision(entity_a))
-
-                    if (lives := manager.fetch_component(other, Lives.cid)) is not None:
-                        bullet_player_tag = manager.fetch_component(bullet, PlayerTag.cid)
-                        bullet_enemy_tag = manager.fetch_component(bullet, EnemyTag.cid)
-                        other_player_tag = manager.fetch_component(other, PlayerTag.cid)
-                        other_enemy_tag = manager.fetch_component(other, EnemyTag.cid)
+        ## unpack the colliders into parallel columns once per frame, so that
+        ## the pairwise tests below work on flat lists of floats rather than
+        ## chasing component attributes for every pair
+        entities = components.entities
+        transforms = components.column(Transform2D.cid)
+        colliders = components.column(Collider2D.cid)
+        px = [transform.px for transform in transforms]
+        py = [transform.py for transform in transforms]
+        sx = [collider.sx for collider in colliders]
+        sy = [collider.sy for collider in colliders]
+
+        ## split the colliders into bullets and the targets they can hit, 
+        ## looking up each entity's bullet tag only once per frame
+        bullets, targets = [], []
+        for idx, entity in enumerate(entities):
+            if manager.has_component(entity, BulletTag.cid):
+                bullets.append(idx)
+            else:
+                targets.append(idx)
 
-                        if bullet_player_tag != other_player_tag or \
-                            bullet_enemy_tag != other_enemy_tag:
-                            lives.count -= 1
-                            manager.register_component(bullet, StaleTag())
+        if len(entities) < COLLISION_GRID_THRESHOLD:
+            candidates = [(a, b) for a in bullets for b in targets]
+        else:
+            ## bucket every target into the spatial hash, so that each bullet
+            ## is only tested against targets close enough to possibly overlap
+            spatial_hash = self.spatial_hash
+            spatial_hash.clear()
+            for idx in targets:
+                hx, hy = sx[idx] / 2, sy[idx] / 2
+                spatial_hash.insert(idx,
+                        px[idx] - hx, py[idx] - hy, px[idx] + hx, py[idx] + hy)
+
+            candidates = []
+            for a in bullets:
+                hx, hy = sx[a] / 2, sy[a] / 2
+                for b in spatial_hash.query(
+                        px[a] - hx, py[a] - hy, px[a] + hx, py[a] + hy):
+                    candidates.append((a, b))
+
+        ## overlapping pairs are rare, so the tags deciding which side each
+        ## entity is on are only looked up once a pair is known to overlap.
+        ## An entity may overlap several others, so its tags are cached for 
+        ## the rest of the frame
+        sides = {}
+        def side(entity):
+            if (tags := sides.get(entity)) is None:
+                tags = (manager.has_component(entity, PlayerTag.cid),
+                        manager.has_component(entity, EnemyTag.cid))
+                sides[entity] = tags
+            return tags
+
+        for a, b in collide(px, py, sx, sy, candidates):
+            bullet = entities[a]
+            other = entities[b]
+
+            ## TODO: consider splitting collision resolution into separate system?
+            #manager.register_component(bullet, Collision(other))
+            #manager.register_component(other, Collision(bullet))
+
+            if (lives := manager.fetch_component(other, Lives.cid)) is not None:
+                if side(bullet) != side(other):
+                    lives.count -= 1
+                    manager.register_component(bullet, StaleTag())
 
         return EcsContinuation.Continue
 
@@ -227,8 +367,13 @@ class Physics2DSystem(SystemBase):
         pass
 
 
-    def process(self, dt, manager, components) -> EcsContinuation:
-        for transform, velocity in components:
+    @columnar
+    def process(self, dt, manager, transforms, velocities) -> EcsContinuation:
+        ## the columns hold component objects which other systems read from
+        ## and write to directly, so the integration step has to write back 
+        ## through each transform. Walking the two columns in lockstep keeps 
+        ## this to one attribute read and one write per axis per entity
+        for transform, velocity in zip(transforms, velocities):
             transform.px += velocity.vx * dt
             transform.py += velocity.vy * dt
 
@@ -244,6 +389,9 @@ class UserInputSystem(SystemBase):
     """
     System to handle user input (keypresses).
     """
+    ## input must still be handled while paused, so that the game can be unpaused
+    runs_while_paused = True
+
     def actions(self):
         return {
             self.process: (Transform2D, Collider2D, Velocity2D, UserInput),
@@ -301,6 +449,7 @@ class UserInputSystem(SystemBase):
                 'right',
                 'b',
                 'a']
+        self.easter_egg_keys = set(self.easter_egg)
         
         ## the current input value
         self.input_bitmask = 0
@@ -308,6 +457,24 @@ class UserInputSystem(SystemBase):
         ## bitmask used to get the inverse input_mask
         self.inverse_bitmask = 0b11111111
 
+        ## maps each of the 9 possible (x, y) movement directions to a unit
+        ## vector (or the zero vector). The vectors are normalised to ensure
+        ## that the entity cannot use diagonal movement to break the speed 
+        ## barrier
+        self.directions = {}
+        for x in (-1, 0, 1):
+            for y in (-1, 0, 1):
+                magnitude = (x * x + y * y) ** 0.5
+                self.directions[x, y] = (x / magnitude, y / magnitude) if magnitude else (0, 0)
+
+        ## maps a key straight to the (set, reset, release) bitmasks of its
+        ## control event, so that key events need only a single lookup
+        self.key_masks = {
+            key: (self.input_masks[binding], self.input_reset_masks[binding],
+                  self.inverse_bitmask ^ self.input_masks[binding])
+            for key, binding in self.controls.items()
+        }
+
         self.primary_cooldown = 0.15
         self.can_shoot_primary = True
 
@@ -351,12 +518,19 @@ class UserInputSystem(SystemBase):
         self.can_shoot_secondary = True
 
 
-    def check_mask(self, event):
-        return (self.input_bitmask & self.input_masks[event]) == self.input_masks[event]
-
-
     def process(self, dt, manager, components) -> EcsContinuation:
+        ## decode the whole input bitmask once per frame, rather than once
+        ## per control checked
         e = self.input_bitmask
+        masks = self.input_masks
+        left = bool(e & masks['left'])
+        right = bool(e & masks['right'])
+        up = bool(e & masks['up'])
+        down = bool(e & masks['down'])
+        fire_primary = e & masks['fire_primary']
+        fire_secondary = e & masks['fire_secondary']
+        menu = e & masks['menu']
+        boss = e & masks['boss']
 
         for transform, collider, velocity, user_input in components:
             entity = transform.eid
@@ -368,7 +542,7 @@ class UserInputSystem(SystemBase):
                     lives.count = 30
                     self.completed_easter_egg = False
 
-            if self.check_mask('menu'):
+            if menu:
                 if self.can_toggle_menu_key:
                     if not self.currently_paused:
                         manager.pause()
@@ -384,9 +558,9 @@ class UserInputSystem(SystemBase):
 
                         self.can_toggle_menu_key = False
                         self.screen.do_after(self.menu_key_cooldown,
-                                lambda: self.reset_menu_key())
+                                self.reset_menu_key)
             
-            if self.check_mask('boss'):
+            if boss:
                 if self.can_toggle_boss_key:
                     if not self.currently_paused:
                         manager.pause()
@@ -402,27 +576,12 @@ class UserInputSystem(SystemBase):
 
                         self.can_toggle_boss_key = False
                         self.screen.do_after(self.boss_key_cooldown,
-                                lambda: self.reset_boss_key())
-
-            vx, vy = 0, 0
-            if self.check_mask('left'):
-                vx = -1
-            if self.check_mask('right'):
-                vx = 1
-            if self.check_mask('up'):
-                vy = -1
-            if self.check_mask('down'):
-                vy = 1
-
-            ## we normalise the entities velocity vector to ensure that the
-            ## entity cannot use diagonal movement to break the speed barrier
-            magnitude = (vx * vx + vy * vy) ** 0.5
-            if magnitude:
-                vx = (vx / magnitude) * user_input.speed
-                vy = (vy / magnitude) * user_input.speed
-            else:
-                vx *= user_input.speed
-                vy *= user_input.speed
+                                self.reset_boss_key)
+
+            ## opposing directions can never both be held, as pressing one 
+            ## clears the other from the bitmask
+            nx, ny = self.directions[right - left, down - up]
+            vx, vy = nx * user_input.speed, ny * user_input.speed
 
             ## clamp the user to the playing field
             dx, dy = collider.sx // 2, collider.sy // 2
@@ -443,21 +602,21 @@ class UserInputSystem(SystemBase):
             velocity.vx = vx
             velocity.vy = vy
 
-            if self.check_mask('fire_primary'):
+            if fire_primary:
                 if self.can_shoot_primary:
                     manager.register_component(entity, FireLinearBulletEmitter())
 
                     self.can_shoot_primary = False
                     self.screen.do_after(self.primary_cooldown,
-                            lambda: self.reset_primary())
+                            self.reset_primary)
 
-            if self.check_mask('fire_secondary'):
+            if fire_secondary:
                 if self.can_shoot_secondary:
                     manager.register_component(entity, FireRadialBulletEmitter())
 
                     self.can_shoot_secondary = False
                     self.screen.do_after(self.secondary_cooldown,
-                            lambda: self.reset_secondary())
+                            self.reset_secondary)
 
         return self.continuation
 
@@ -478,30 +637,30 @@ class UserInputSystem(SystemBase):
 
 
     def handle_key_pressed(self, event):
-        self.move_next_code_elem(event.keysym.lower())
+        ## every binding is lowercase, so the keysym need only be lowered once
+        key = event.keysym.lower()
 
-        if event.keysym in self.controls:
-            binding = self.controls[event.keysym]
-        elif event.keysym.lower() in self.controls:
-            binding = self.controls[event.keysym.lower()]
-        else:
+        ## keys outside the code can only ever break the sequence
+        if key in self.easter_egg_keys:
+            self.move_next_code_elem(key)
+        elif self.easter_egg_idx > 0:
+            self.easter_egg_idx = 0
+
+        masks = self.key_masks.get(key)
+        if masks is None:
             return
 
-        if binding in self.input_masks and binding in self.input_reset_masks:
-            self.input_bitmask &= self.input_reset_masks[binding]
-            self.input_bitmask |= self.input_masks[binding]
+        set_mask, reset_mask, _ = masks
+        self.input_bitmask = (self.input_bitmask & reset_mask) | set_mask
 
 
     def handle_key_released(self, event):
-        if event.keysym in self.controls:
-            binding = self.controls[event.keysym]
-        elif event.keysym.lower() in self.controls:
-            binding = self.controls[event.keysym.lower()]
-        else:
+        masks = self.key_masks.get(event.keysym.lower())
+        if masks is None:
             return
 
-        if binding in self.input_masks and binding in self.input_reset_masks:
-            self.input_bitmask &= self.inverse_bitmask ^ self.input_masks[binding]
+        _, _, release_mask = masks
+        self.input_bitmask &= release_mask
 
 
     def handle_window_closed(self):
@@ -517,6 +676,9 @@ class LifeSystem(SystemBase):
     """
     Clears dead entities.
     """
+    ## the game over screen pauses the game, and stops the ECS once it is closed
+    runs_while_paused = True
+
     def actions(self):
         return {
             self.process: (Lives,),
@@ -527,37 +689,51 @@ class LifeSystem(SystemBase):
         self.screen = screen
         self.continuation = EcsContinuation.Continue
 
+        ## the player entity, which is found the first time its score needs
+        ## updating. Entity ids are never reused, so it stays valid until the
+        ## player dies
+        self.player = None
+
 
     def process(self, dt, manager, components) -> EcsContinuation:
-        player = -1
         score_delta = 0
+        player_died = False
 
         for lives, in components:
+            ## most entities are alive, so their tags need not be looked up
+            if lives.count > 0:
+                continue
+
             entity = lives.eid
-    
-            player_tag = manager.fetch_component(entity, PlayerTag.cid)
 
-            if player_tag is not None:
-                player = entity
+            if manager.has_component(entity, PlayerTag.cid):
+                player_died = True
+                manager.pause()
+                self.screen.set_tracked_entity(-1)
 
-            if lives.count <= 0:
-                if player_tag is not None:
-                    manager.pause()
-                    self.screen.set_tracked_entity(-1)
+                def callback():
+                    self.continuation = EcsContinuation.Stop
 
-                    def callback():
-                        self.continuation = EcsContinuation.Stop
+                self.screen.toggle_gameover(callback)
 
-                    self.screen.toggle_gameover(callback)
+            if manager.has_component(entity, EnemyTag.cid):
+                score_delta += 1
 
-                if manager.fetch_component(entity, EnemyTag.cid):
-                    score_delta += 1
+            manager.register_component(entity, StaleTag())
 
-                manager.register_component(entity, StaleTag())
+        if score_delta:
+            if self.player is None:
+                for lives, in components:
+                    if manager.has_component(lives.eid, PlayerTag.cid):
+                        self.player = lives.eid
+                        break
+
+            if self.player is not None:
+                player_score = manager.fetch_component(self.player, Score.cid)
+                player_score.count += score_delta
 
-        if player != -1:
-            player_score = manager.fetch_component(player, Score.cid)
-            player_score.count += score_delta
+        if player_died:
+            self.player = None
 
         return self.continuation
 
@@ -569,26 +745,42 @@ class LifeSystem(SystemBase):
 @AutoId.system
 class LifespanSystem(SystemBase):
     """
-    System to kill components that exceed their lifespan.
+    System to kill components that exceed their lifespan, or that leave the
+    playfield before their lifespan is up.
     """
     def actions(self):
         return {
-            self.process: (Lifespan,),
+            self.process: (Transform2D, Lifespan),
         }
 
 
     def setup(self, manager, screen):
-        pass
+        ## the bounds outside of which an entity is culled early
+        self.min_px, self.max_px = -PLAYFIELD_MARGIN, WIDTH + PLAYFIELD_MARGIN
+        self.min_py, self.max_py = -PLAYFIELD_MARGIN, HEIGHT + PLAYFIELD_MARGIN
 
 
-    def process(self, dt, manager, components) -> EcsContinuation:
-        for lifespan, in components:
-            entity = lifespan.eid
+    @columnar
+    def process(self, dt, manager, transforms, lifespans) -> EcsContinuation:
+        min_px, max_px = self.min_px, self.max_px
+        min_py, max_py = self.min_py, self.max_py
 
-            lifespan.ttl -= dt
+        ## age every entity in one pass over the columns, only collecting the
+        ## (usually few) expired entities, and then mark those as stale
+        expired = []
+        for transform, lifespan in zip(transforms, lifespans):
+            ttl = lifespan.ttl - dt
+            lifespan.ttl = ttl
 
-            if lifespan.ttl < 0:
-                manager.register_component(entity, StaleTag())
+            ## a single check covers both ways of expiring, so that an entity 
+            ## is only ever marked stale once
+            if ttl < 0 or \
+               not min_px < transform.px < max_px or \
+               not min_py < transform.py < max_py:
+                expired.append(transform.eid)
+
+        for entity in expired:
+            manager.register_component(entity, StaleTag())
 
         return EcsContinuation.Continue
 
@@ -597,56 +789,126 @@ class LifespanSystem(SystemBase):
         pass
 
 
-@AutoId.system
-class BulletEmitterSystem(SystemBase):
+class BulletPool:
     """
-    Controls entities with a bullet emitter.
+    Recycles expired bullet entities, so that firing a bullet does not have to
+    create a new entity, canvas item and set of components every time. An 
+    expired bullet is parked by deregistering its transform, which takes it 
+    out of every archetype that would move, collide, age or draw it, while all
+    of its other components stay registered.
     """
-    def actions(self):
-        return {
-            self.process_linear: (Transform2D, Collider2D, LinearBulletEmitter),
-            self.process_radial: (Transform2D, Collider2D, RadialBulletEmitter),
-        }
+    def __init__(self, screen, capacity: int):
+        self.screen = screen
+        self.capacity = capacity
 
+        ## holds the (entity, transform, collider, velocity, lifespan, sprite) 
+        ## of parked bullets, ready to be handed out again
+        self.free = []
 
-    def setup(self, manager, screen):
-        self.screen = screen
 
+    def acquire(self, manager, px, py, vx, vy, bullet_data) -> int:
+        """
+        Returns a bullet entity at the given position and with the given
+        velocity, reusing a parked bullet if possible.
+        """
+        ## precomputed, so that bullets can travel the diagonal of the 
+        ## playfield at least
+        lifespan = bullet_data.bullet_lifespan
+
+        ## bullets with the same velocity always move by the same amount, so
+        ## they are grouped under a shared tag and redrawn with a single move.
+        ## The velocities are written out in full, so that bullets are only
+        ## grouped when their velocities are exactly equal
+        group = f'bullet:{vx!r}:{vy!r}'
+
+        if self.free:
+            bullet, transform, collider, velocity, bullet_lifespan, sprite = self.free.pop()
+
+            transform.px, transform.py, transform.theta = px, py, 0
+            collider.sx = collider.sy = bullet_data.bullet_size
+            velocity.vx, velocity.vy = vx, vy
+            bullet_lifespan.ttl = lifespan
+
+            ## the canvas item stays hidden until it is next drawn, when it is
+            ## moved into place and shown
+            sprite.vertices = bullet_data.bullet_vertices
+            sprite.last_px = sprite.last_py = sprite.last_theta = None
+            sprite.group = group
+            self.screen.update(sprite.handle, fill=bullet_data.bullet_colour,
+                    tags=group)
+
+            ## registering the transform again puts the bullet back into play
+            manager.register_component(bullet, transform)
+            return bullet
 
-    def create_bullet(self, manager, bullet_transform, bullet_velocity, bullet_data):
         bullet = manager.create_entity()
 
-        bullet_collider = Collider2D(
-            bullet_data.bullet_size, bullet_data.bullet_size)
-
         bullet_screen_element = self.screen.draw_poly(
-            bullet_data.bullet_vertices,
-            fill=bullet_data.bullet_colours[bullet_data.bullet_colour_idx])
+            bullet_data.bullet_vertices, fill=bullet_data.bullet_colour,
+            tags=group, state='hidden')
+
+        manager.register_component(bullet, Transform2D(px, py, 0))
+        manager.register_component(bullet, Collider2D(
+            bullet_data.bullet_size, bullet_data.bullet_size))
+        manager.register_component(bullet, Velocity2D(vx, vy))
+        manager.register_component(bullet, Lifespan(lifespan))
+        manager.register_component(bullet, ScreenElement(
+            bullet_screen_element, bullet_data.bullet_vertices, group=group))
+        manager.register_component(bullet, BulletTag())
+        manager.register_component(bullet, Pooled(self))
+
+        return bullet
+
 
-        bullet_data.bullet_colour_idx += 1
-        bullet_data.bullet_colour_idx %= len(bullet_data.bullet_colours)
+    def release(self, manager, bullet: int):
+        """
+        Parks the given bullet entity, hiding its canvas item and keeping its
+        components for reuse. If the pool is already full, the bullet is 
+        destroyed and its canvas item removed instead.
+        """
+        sprite = manager.fetch_component(bullet, ScreenElement.cid)
 
-        bullet_sprite = ScreenElement(
-            bullet_screen_element, bullet_data.bullet_vertices)
+        if len(self.free) >= self.capacity:
+            self.screen.remove(sprite.handle)
+            manager.destroy_entity(bullet)
+            return
 
-        ## ensure that bullets can travel the diagonal of the playfield at least
-        lifespan = (((HEIGHT ** 2) + (WIDTH ** 2)) ** 0.5) / abs(bullet_data.bullet_speed)
-        bullet_lifespan = Lifespan(lifespan)
+        ## a parked bullet leaves its group, so that group moves neither match
+        ## nor shift its hidden canvas item
+        self.screen.update(sprite.handle, state='hidden', tags='')
+        sprite.group = None
 
-        manager.register_component(bullet, bullet_transform)
-        manager.register_component(bullet, bullet_collider)
-        manager.register_component(bullet, bullet_velocity)
-        manager.register_component(bullet, bullet_lifespan)
-        manager.register_component(bullet, bullet_sprite)
-        manager.register_component(bullet, BulletTag())
+        ## the side a bullet is on is decided by whoever fires it next
+        for tag in (StaleTag, PlayerTag, EnemyTag):
+            manager.deregister_component(bullet, tag.cid)
 
-        return bullet
+        self.free.append((
+            bullet,
+            manager.deregister_component(bullet, Transform2D.cid),
+            manager.fetch_component(bullet, Collider2D.cid),
+            manager.fetch_component(bullet, Velocity2D.cid),
+            manager.fetch_component(bullet, Lifespan.cid),
+            sprite))
 
 
-    def process_linear(self, dt, manager, components) -> EcsContinuation:
-        if dt == 0:  ## dont shoot when paused
-            return EcsContinuation.Continue
+@AutoId.system
+class BulletEmitterSystem(SystemBase):
+    """
+    Controls entities with a bullet emitter.
+    """
+    def actions(self):
+        return {
+            self.process_linear: (Transform2D, Collider2D, LinearBulletEmitter),
+            self.process_radial: (Transform2D, Collider2D, RadialBulletEmitter),
+        }
+
 
+    def setup(self, manager, screen):
+        self.screen = screen
+        self.pool = BulletPool(screen, BULLET_POOL_SIZE)
+
+
+    def process_linear(self, dt, manager, components) -> EcsContinuation:
         for transform, collider, emitter in components:
             entity = transform.eid
             
@@ -655,27 +917,20 @@ class BulletEmitterSystem(SystemBase):
 
             manager.deregister_component(entity, tag.cid)
 
-            bullet_transform = Transform2D(transform.px, transform.py, 0)
-
             vx, vy = 0, emitter.data.bullet_speed
 
-            bullet_velocity = Velocity2D(vx, vy) 
-
-            bullet = self.create_bullet(
-                manager, bullet_transform, bullet_velocity, emitter.data)
+            bullet = self.pool.acquire(
+                manager, transform.px, transform.py, vx, vy, emitter.data)
 
-            if manager.fetch_component(entity, PlayerTag.cid) is not None:
+            if manager.has_component(entity, PlayerTag.cid):
                 manager.register_component(bullet, PlayerTag())
-            elif manager.fetch_component(entity, EnemyTag.cid) is not None:
+            elif manager.has_component(entity, EnemyTag.cid):
                 manager.register_component(bullet, EnemyTag())
 
         return EcsContinuation.Continue
 
 
     def process_radial(self, dt, manager, components) -> EcsContinuation:
-        if dt == 0:  ## dont shoot when paused
-            return EcsContinuation.Continue
-
         for transform, collider, emitter in components:
             entity = transform.eid
 
@@ -684,32 +939,16 @@ class BulletEmitterSystem(SystemBase):
 
             manager.deregister_component(entity, tag.cid)
 
-            sweep_increment = 2 * pi / emitter.bullet_count 
-
             bullet_data = emitter.data
+            speed = bullet_data.bullet_speed
 
-            for n in range(emitter.bullet_count):
-                bullet_transform = Transform2D(transform.px, transform.py, 0)
-
-                theta = emitter.bullet_arc_offset + (n * sweep_increment)
-
-                ## Clockwise Rotation matrix:
-                ## [  cos0 sin0 ] [ x ] = [  x*cos0 + y*sin0 ]
-                ## [ -sin0 cos0 ] [ y ]   [ -x*sin0 + y*cos0 ]
-                ## Since we only have a 1-dimensional 'speed', we assign it to
-                ## 'y' (completely arbitrarily) and then calculate the [vx vy]
-                ## vector for the rotated projectile (we assume x = 0)
-                vx, vy = sin(theta), cos(theta)
-
-                speed = emitter.data.bullet_speed
-                bullet_velocity = Velocity2D(vx * speed, vy * speed)
+            for vx, vy in emitter.directions:
+                bullet = self.pool.acquire(manager, transform.px, transform.py,
+                    vx * speed, vy * speed, bullet_data)
 
-                bullet = self.create_bullet(
-                    manager, bullet_transform, bullet_velocity, bullet_data)
-
-                if manager.fetch_component(entity, PlayerTag.cid) is not None:
+                if manager.has_component(entity, PlayerTag.cid):
                     manager.register_component(bullet, PlayerTag())
-                elif manager.fetch_component(entity, EnemyTag.cid) is not None:
+                elif manager.has_component(entity, EnemyTag.cid):
                     manager.register_component(bullet, EnemyTag())
 
         return EcsContinuation.Continue
@@ -732,20 +971,16 @@ class SpawnerSystem(SystemBase):
 
     def setup(self, manager, screen):
         self.screen = screen
-        self.cooldowns = {}
 
 
     def process(self, dt, manager, components) -> EcsContinuation:
         for spawner, in components:
-            entity = spawner.eid
-            cooldown_remaining = self.cooldowns.get(entity, 0)
-
-            cooldown_remaining -= dt
-            if cooldown_remaining <= 0:
-                cooldown_remaining, (spawn_px, spawn_py) = next(spawner.spawn_generator)
-                new_entity = spawner.instantiate((spawn_px, spawn_py), manager, self.screen)
-            
-            self.cooldowns[entity] = cooldown_remaining
+            spawner.cooldown_remaining -= dt
+            if spawner.cooldown_remaining <= 0:
+                spawner.cooldown_remaining, (spawn_px, spawn_py), spawn_score = \
+                        next(spawner.spawn_generator)
+                new_entity = spawner.instantiate((spawn_px, spawn_py), manager,
+                        self.screen, spawn_score)
 
         return EcsContinuation.Continue
 
@@ -766,24 +1001,19 @@ class EnemyEmitterSystem(SystemBase):
 
 
     def setup(self, manager, screen):
-        self.cooldowns = {}
+        pass
 
 
     def process(self, dt, manager, components) -> EcsContinuation:
         for emitter_cooldown, in components:
-            entity = emitter_cooldown.eid
-
-            remaining_cooldown = self.cooldowns.get(entity, 0)
-
-            remaining_cooldown -= dt
-            if remaining_cooldown <= 0:
+            emitter_cooldown.cooldown_remaining -= dt
+            if emitter_cooldown.cooldown_remaining <= 0:
+                entity = emitter_cooldown.eid
                 manager.register_component(entity, FireLinearBulletEmitter())
                 manager.register_component(entity, FireRadialBulletEmitter())
 
-                remaining_cooldown = random.randint(
+                emitter_cooldown.cooldown_remaining = random.randint(
                         emitter_cooldown.min_cooldown, emitter_cooldown.max_cooldown)
-
-            self.cooldowns[entity] = remaining_cooldown
             
         return EcsContinuation.Continue
 
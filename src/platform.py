@@ -1,23 +1,56 @@
 import tkinter as tk
+import tkinter.font as tkfont
 
 from base64 import b64encode
-from typing import List, Optional
+from functools import lru_cache
+from time import perf_counter
+from typing import List, Optional, Sequence, Tuple
 
 from .common import *
-from .ecs.components import Lives, Score
+from .ecs.components import Lives, Score, Transform2D
 
 
 __all__ = ['Screen']
 
 
+## holds every image loaded so far, indexed by file path and image options
+_image_cache = {}
+
+
 def load_image(fpath, **kwargs) -> Optional[tk.PhotoImage]:
+    key = (fpath, *sorted(kwargs.items()))
+    if (image := _image_cache.get(key)) is not None:
+        return image
+
     try:
-        with open(fpath, 'rb') as f:
-            data = f.read()
-            return tk.PhotoImage(data=b64encode(data), **kwargs)
-    except Exception as err:
-        critical(err)
-        return None
+        ## tk reads the formats it supports natively straight from disk
+        image = tk.PhotoImage(file=fpath, **kwargs)
+    except tk.TclError:
+        try:
+            with open(fpath, 'rb') as f:
+                data = f.read()
+                image = tk.PhotoImage(data=b64encode(data), **kwargs)
+        except Exception as err:
+            critical(err)
+            return None
+
+    _image_cache[key] = image
+    return image
+
+
+## only a handful of rectangle sizes are ever drawn, so each outline is built
+## once and shared as an immutable tuple
+@lru_cache(maxsize=64)
+def _rect_vertices(sx, sy):
+    x0, y0 = -(sx // 2), -(sy // 2)
+    x1, y1 = sx // 2, sy // 2
+
+    return (
+        x0, y0,
+        x1, y0,
+        x1, y1,
+        x0, y1
+    )
 
 
 class Screen():
@@ -33,20 +66,49 @@ class Screen():
                 **kwargs)
         self.canvas.pack()
 
-        self.fps = self.canvas.create_text(
+        ## the canvas methods called every frame are bound once, rather than
+        ## being looked up through the canvas on every call
+        self._itemconfig = self.canvas.itemconfig
+        self._coords = self.canvas.coords
+        self._move = self.canvas.move
+
+        ## each side of the HUD is a single multi-line text item, so that it
+        ## is updated with one reconfigure. The left side shows the FPS and
+        ## object count, and the right side shows the score and lives
+        self.hud_left = self.canvas.create_text(
                 5, 5, anchor='nw', fill=WHITE)
-        self.objects = self.canvas.create_text(
-                5, 20, anchor='nw', fill=WHITE)
-        self.score = self.canvas.create_text(
-                WIDTH - 5, 5, anchor='ne', fill=WHITE)
-        self.lives = self.canvas.create_text(
-                WIDTH - 5, 20, anchor='ne', fill=WHITE)
+        self.hud_right = self.canvas.create_text(
+                WIDTH - 5, 5, anchor='ne', justify='right', fill=WHITE)
 
         self._tracked_entity = -1
         self._tracked_score = 0
         self._tracked_lives = 0
+
+        ## the tracked entity's lives and score components. Fetched on the
+        ## first tick after the tracked entity changes, as only the tick has
+        ## the manager to fetch them from
+        self._lives_component = None
+        self._score_component = None
+
         self.player_name = 'John Doe'
 
+        ## removed canvas items are hidden and kept for reuse, rather than 
+        ## being deleted and later recreated. A reused item keeps any option
+        ## it is not given, so items are only reused by draws which set the 
+        ## same options. Holds lists of hidden items, indexed by item type and
+        ## option names, and the same key for each drawn item, indexed by its
+        ## handle
+        self._item_pool = {}
+        self._item_keys = {}
+
+        ## the value last shown by each HUD item. Items are only formatted and
+        ## reconfigured when their value changes, as each reconfigure is a 
+        ## Tcl call 
+        self._last_fps = 0.0
+        self._last_obj = None
+        self._last_score = None
+        self._last_lives = None
+
         self.boss_image = self.canvas.create_image(1, 1, anchor='nw', 
             state='hidden', tags='boss-key-img')
         self.boss_image_shown = False
@@ -63,10 +125,15 @@ class Screen():
                 WIDTH * 0.75, HEIGHT * 0.75,
                 fill=BLACK, state='hidden', tags='menu')
 
+        ## fonts are created once and shared by name, rather than having tk
+        ## parse a font description for every text item
         menu_title_fontsize = 13
+        self.menu_title_font = tkfont.Font(root=self.root, size=menu_title_fontsize)
+        self.gameover_font = tkfont.Font(root=self.root, size=20)
+
         self.menu_title = self.canvas.create_text(
                 WIDTH * 0.5, HEIGHT * 0.25 + menu_title_fontsize,
-                text='Paused', font=menu_title_fontsize, anchor='center', 
+                text='Paused', font=self.menu_title_font, anchor='center', 
                 fill=WHITE, state='hidden', tags='menu')
 
         self.menu_quit_btn_callback = lambda: None
@@ -75,7 +142,7 @@ class Screen():
                 width=WIDTH * 0.4, height=20,
                 window=tk.Button(self.canvas, text='Quit', bg=RED,
                     command=lambda: self.menu_quit_btn_callback()),
-                anchor='nw', state='hidden', tag='menu')
+                anchor='nw', state='hidden', tags='menu')
 
         self.menu_save_btn_callback = lambda: self.save_state()
         self.menu_save_btn = self.canvas.create_window(
@@ -83,37 +150,116 @@ class Screen():
                 width=WIDTH * 0.4, height=20,
                 window=tk.Button(self.canvas, text='Save', bg=RED,
                     command=lambda: self.menu_save_btn_callback()),
-                anchor='nw', state='hidden', tag='menu')
+                anchor='nw', state='hidden', tags='menu')
 
         self.controls_text = self.canvas.create_text(
                 WIDTH * 0.3, HEIGHT * 0.4,
                 width=WIDTH * 0.4, text=HELP_CONTENTS, fill=WHITE,
-                anchor='nw', state='hidden', tag='menu')
+                anchor='nw', state='hidden', tags='menu')
 
+        ## the high score window is built up front and kept hidden, so that 
+        ## the game over screen only has to show it
+        self.highscore_window = tk.Toplevel(self.root)
+        self.highscore_window.title('Enter your name')
+        self.highscore_window.withdraw()
 
-    def tick(self, dt: float, manager):
-        if self._tracked_entity != -1:
-            self._tracked_lives = manager.fetch_component(
-                    self._tracked_entity, Lives.cid).count
-            self._tracked_score = manager.fetch_component(
-                    self._tracked_entity, Score.cid).count
+        self.name_variable = tk.StringVar(self.highscore_window)
+
+        self.name_entry = tk.Entry(self.highscore_window,
+                textvariable=self.name_variable)
+        self.name_entry.pack()
 
-            self.canvas.itemconfig(self.score,
-                    text=f'SCORE: {self._tracked_score:9}')
-            self.canvas.itemconfig(self.lives,
-                    text=f'LIVES: {self._tracked_lives:9}')
+        self.highscore_btn_callback = lambda: None
+        self.highscore_btn = tk.Button(self.highscore_window, text='Submit',
+                command=lambda: self.highscore_btn_callback())
+        self.highscore_btn.pack()
 
-        if dt != 0:
-            self.canvas.itemconfig(self.fps, text=f'FPS: {1/dt:9.3f}')
 
-        self.canvas.itemconfig(self.objects,
-                text=f'OBJ: {len(manager.entities):9}')
+    def tick(self, dt: float, manager):
+        ## the HUD is covered by the menu or the boss-key image, and the game 
+        ## is paused underneath either of them, so it need not be updated
+        if self.menu_shown or self.boss_image_shown:
+            return
 
-        self.root.update()
+        if self._tracked_entity != -1:
+            if self._lives_component is None:
+                self._lives_component = manager.fetch_component(
+                        self._tracked_entity, Lives.cid)
+                self._score_component = manager.fetch_component(
+                        self._tracked_entity, Score.cid)
+
+            self._tracked_lives = self._lives_component.count
+            self._tracked_score = self._score_component.count
+
+            if self._tracked_score != self._last_score or \
+               self._tracked_lives != self._last_lives:
+                self._itemconfig(self.hud_right,
+                        text='SCORE: %9d\nLIVES: %9d' % (
+                            self._tracked_score, self._tracked_lives))
+                self._last_score = self._tracked_score
+                self._last_lives = self._tracked_lives
+
+        ## the fps is shown to a single decimal place, so that frame time
+        ## jitter below that does not force a reconfigure. While paused, the
+        ## last fps is kept
+        fps = round(1 / dt, 1) if dt != 0 else self._last_fps
+        ## only objects in play are counted. Every one of them has a transform,
+        ## while parked pooled bullets have theirs deregistered
+        objects = manager.count_components(Transform2D.cid)
+        if fps != self._last_fps or objects != self._last_obj:
+            self._itemconfig(self.hud_left,
+                    text='FPS: %9.1f\nOBJ: %9d' % (fps, objects))
+            self._last_fps = fps
+            self._last_obj = objects
+
+
+    def run_loop(self, step_callback, target_fps=TARGET_FPS):
+        """
+        Calls the given callback once per frame from the tk event loop, until 
+        it returns False. Blocks until then, while still handling window events.
+        Any exception raised by the callback ends the loop, and is re-raised.
+        """
+        self._step_callback = step_callback
+        self._frame_ms = 1000 / target_fps
+        self._loop_finished = tk.BooleanVar(self.root, False)
+        self._loop_error = None
+
+        self.canvas.after_idle(self._pump)
+        self.root.wait_variable(self._loop_finished)
+
+        if self._loop_error is not None:
+            raise self._loop_error
+
+
+    def _pump(self):
+        start = perf_counter()
+
+        ## exceptions would otherwise be swallowed by tk, leaving run_loop 
+        ## waiting forever for a frame that is never scheduled
+        try:
+            running = self._step_callback()
+        except Exception as err:
+            self._loop_error = err
+            running = False
+
+        ## window events are handled by the tk event loop between frames, so
+        ## only the redraws from the whole frame need to be flushed here
+        self.canvas.update_idletasks()
+
+        if not running:
+            self._loop_finished.set(True)
+            return
+
+        ## the next frame is scheduled for however much of the frame time is
+        ## left, so slow frames are not delayed any further
+        elapsed_ms = (perf_counter() - start) * 1000
+        self.canvas.after(max(0, int(self._frame_ms - elapsed_ms)), self._pump)
 
 
     def set_tracked_entity(self, entity):
         self._tracked_entity = entity
+        self._lives_component = None
+        self._score_component = None
 
 
     def get_score(self):
@@ -128,28 +274,40 @@ class Screen():
         return self.player_name
 
 
+    def _draw(self, kind, create, coords, **kwargs):
+        ## the state and tags of an item are reset whenever it is hidden or 
+        ## reused, so they do not need to match
+        key = (kind, *sorted(kwargs.keys() - {'state', 'tag', 'tags'}))
+
+        if pool := self._item_pool.get(key):
+            handle = pool.pop()
+
+            kwargs.setdefault('state', 'normal')
+            self._coords(handle, *coords)
+            self._itemconfig(handle, **kwargs)
+        else:
+            handle = create(*coords, **kwargs)
+
+        self._item_keys[handle] = key
+        return handle
+
+
     def draw_text(self, x, y, content, **kwargs):
-        return self.canvas.create_text(x, y, text=content, **kwargs)
+        return self._draw('text', self.canvas.create_text, (x, y),
+                text=content, **kwargs)
 
 
     def draw_image(self, x, y, **kwargs):
-        return self.canvas.create_image(x, y, **kwargs)
+        return self._draw('image', self.canvas.create_image, (x, y), **kwargs)
 
 
-    def draw_poly(self, vertices: List[int], **kwargs):
-        return self.canvas.create_polygon(*vertices, **kwargs)
+    def draw_poly(self, vertices: Sequence[int], **kwargs):
+        return self._draw('polygon', self.canvas.create_polygon, vertices,
+                **kwargs)
 
 
     def rect_vertices(self, sx, sy):
-        x0, y0 = -(sx // 2), -(sy // 2)
-        x1, y1 = sx // 2, sy // 2
-
-        return [
-            x0, y0,
-            x1, y0,
-            x1, y1,
-            x0, y1
-        ]
+        return _rect_vertices(sx, sy)
 
 
     def raise_tag(self, tag):
@@ -161,24 +319,60 @@ class Screen():
 
 
     def update(self, handle, *args, **kwargs):
-        self.canvas.itemconfig(handle, *args, **kwargs)
+        self._itemconfig(handle, *args, **kwargs)
 
 
     def get_coords(self, handle, **kwargs):
-        return self.canvas.coords(handle)
+        return self._coords(handle)
 
 
     def set_coords(self, handle, coords: List[int], **kwargs):
-        self.canvas.coords(handle, *coords, **kwargs)
+        self._coords(handle, *coords, **kwargs)
+
+
+    def set_coords_batch(self, updates: List[Tuple[int, List[int]]],
+            shown: Sequence[int] = ()):
+        """
+        Sets the coords of every (handle, coords) pair given, and then shows 
+        every item in shown, using a single Tcl script rather than one Tcl 
+        call per item.
+        """
+        if len(updates) == 1 and not shown:
+            handle, coords = updates[0]
+            self._coords(handle, *coords)
+            return
+
+        ## handles are ints and coords are numbers, so neither need escaping
+        widget = self.canvas._w
+        script = [f'{widget} coords {handle} {" ".join(map(str, coords))}'
+                  for handle, coords in updates]
+        script.extend(f'{widget} itemconfigure {handle} -state normal'
+                      for handle in shown)
+        self.canvas.tk.eval(';'.join(script))
+
+
+    def move(self, handle, dx, dy):
+        self._move(handle, dx, dy)
 
 
     def remove(self, handle):
-        self.canvas.delete(handle)
+        ## items which were not drawn through the screen are simply deleted
+        if (key := self._item_keys.pop(handle, None)) is None:
+            self.canvas.delete(handle)
+            return
+
+        ## hidden items drop their tags, so that they are not matched by any
+        ## operation on a tag while waiting to be reused
+        self._itemconfig(handle, state='hidden', tags='')
+        self._item_pool.setdefault(key, []).append(handle)
 
 
     def remove_all(self):
         self.canvas.delete(tk.ALL)
 
+        self._item_pool.clear()
+        self._item_keys.clear()
+
 
     def set_event_handler(self, event, handler):
         self.root.bind(event, handler)
@@ -213,39 +407,28 @@ class Screen():
     def toggle_menu(self):
         self.raise_tag('menu')
 
-        menu_elements = self.canvas.find_withtag('menu')
-
+        ## every menu element shares the menu tag, so they can all be shown or
+        ## hidden with a single reconfigure
         if self.menu_shown:
-            for element in menu_elements:
-                self.update(element, state='hidden')
-
+            self.update('menu', state='hidden')
             self.menu_shown = False
         else:
-            for element in menu_elements:
-                self.update(element, state='normal')
-
+            self.update('menu', state='normal')
             self.menu_shown = True
 
 
     def toggle_gameover(self, finished_callback):
-        self.draw_text(WIDTH / 2, HEIGHT / 2, 'GAME OVER', font='20', fill=RED,
-                anchor='center')
-
-        highscore_window = tk.Toplevel(self.root)
-        highscore_window.title('Enter your name')
-
-        name_variable = tk.StringVar()
-        name_variable.set(self.player_name)
+        self.draw_text(WIDTH / 2, HEIGHT / 2, 'GAME OVER',
+                font=self.gameover_font, fill=RED, anchor='center')
 
-        name_entry = tk.Entry(highscore_window, textvariable=name_variable)
-        name_entry.pack()
+        self.name_variable.set(self.player_name)
 
         def submit():
-            self.player_name = name_variable.get()
+            self.player_name = self.name_variable.get()
             finished_callback()
 
-        finish_btn = tk.Button(highscore_window, text='Submit', command=submit)
-        finish_btn.pack()
+        self.highscore_btn_callback = submit
+        self.highscore_window.deiconify()
 
 
     def destroy(self):